@@ -1,20 +1,21 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 from datetime import date
 
-from netflix_processing import process_netflixhistory, getNetflixMetadata, check_netflixhistory
-from letterboxd_processing import scrape_all_films, scrape_films_one_page, getFilmMetadataDF, get_poster_path
-from preprocessing import clean_movie_df, filter_year_and_rating, filter_genres, extract_json_to_list, check_input_type
+from letterboxd_processing import get_poster_path
+from preprocessing import filter_year_and_rating, filter_genres, check_input_type
+from member_ingestion import get_progress_tracker, get_member_progress, get_member_pipeline_stages
+from pipeline import run_pipeline, print_pipeline_timings
 
-from individual_reco import getPyMongoDB, getUserRatingSVDDF, trainSVDModel, getSVDRecommendations
-from individual_reco import get_SVD_Dataframe, combineRatingsDF, getAverageRating
+from catalog import load_catalog, get_imdb_index, load_catalog_tfidf, get_title_index
+from individual_reco import getUserRatingSVDDF, get_SVD_Dataframe, getAverageRating
+from individual_reco import foldInUser, getFoldInRecommendations
+from model_registry import get_model
 from individual_reco import sort_rated_df, get_top_genres, get_CBF_description, get_CBF_description_letterboxd
 from individual_reco import get_filtered_CBF_input, get_CBF_cosine_sim
 
-from group_reco import check_expert_user, check_expert_user_3users
-from group_reco import getGroupSVDResults_2Users, getGroupSVDResults_3Users, get_group2_top_genres, get_group3_top_genres
-from group_reco import get_sorted_2group_letterboxd_df, get_sorted_3group_letterboxd_df
-from group_reco import get_2Group_filtered_CBF_input, get_3Group_filtered_CBF_input, get_group_CBF_cosine_sim
+from group_reco import check_expert_users, getGroupSVDScores, getGroupWeights, getGroupSVDResults, get_group_top_genres
+from group_reco import get_sorted_group_letterboxd_df, get_group_filtered_CBF_input, get_group_CBF_cosine_sim
 
 from profile_analysis import get_most_watched_genre, get_least_watched_genre, get_num_genres_watched
 from profile_analysis import get_most_popular_movie, get_least_popular_movie, get_decade_most_movies_watched
@@ -24,6 +25,17 @@ from profile_analysis import get_genre_match_score_3users, get_movie_match_score
 
 st.set_page_config(page_icon="📽️",page_title="WatchList", layout="wide")
 
+# Pipeline stages loading catalog snapshot, its indexes and current recommendation model
+# (loaded once per process, new model versions in the model registry are picked up here).
+# Stages run on worker threads and make no streamlit calls, progress is shown from this thread
+load_stages = [
+    ("catalog", lambda: load_catalog(), []),
+    ("title_index", lambda df_catalog: get_title_index(), ["catalog"]),
+    ("imdb_index", lambda df_catalog: get_imdb_index(), ["catalog"]),
+    ("catalog_tfidf", lambda df_catalog: load_catalog_tfidf(), ["catalog"]),
+    ("model", lambda: get_model(), []),
+]
+
 # ----- SIDEBAR -----
 # Sidebar for recommendation options
 st.sidebar.title("📝 Recommendation Type")
@@ -107,10 +119,6 @@ if reco_type == "Individual":
 
 
     if result:
-        # Get Movie Database as Dataframe
-        df_moviesDB = getPyMongoDB("movies_metadata")
-        # Clean movie df
-        df_moviesDB = clean_movie_df(df_moviesDB)
         today = date.today()
         filename = "{0}_{1}".format(str(today), username)
         # Four types of Input: Letterboxd Username Only, Netflix History Only, Both, or None (ERROR)
@@ -127,50 +135,30 @@ if reco_type == "Individual":
         if input_type == "Error":
             st.error("Error. Please input Letterboxd username or Netflix Viewing History.")
             st.stop()
-        
-        # Process netflix input
-        if input_type == "netflix" or input_type == "both":
-            # convert netflixhistory to dataframe
-            netflixhistory = pd.read_csv(netflixhistory)
-
-            # check validity of netflixhistory
-            validity = check_netflixhistory(netflixhistory)
-            if validity == "invalid":
-                st.error("Error. Netflix Viewing History is invalid. Please try again.")
-                st.stop()
-            elif validity == "insufficient":
-                st.error("Error. Netflix Viewing History is insufficient. Please make sure you have viewed at least 5 titles using your Netflix account.")
-                st.stop()
-            elif validity == "valid":
-                # process netflixhistory
-                df_netflixhistory = process_netflixhistory(netflixhistory)
-                # get netflix metadata
-                df_netflixhistory_metadata = getNetflixMetadata(df_netflixhistory)
-                
+        st.write("---")
 
-        # Process Letterboxd input
-        if input_type == "username" or input_type == "both":
-            # Start scraping user profile
-            with st.spinner('Scraping your movies on Letterboxd'):
-                st.write("---")
-                df_user_profile = scrape_films_one_page(username)
-                # check if df_user_profile is empty
-                if df_user_profile.empty:
-                    st.error("Error. Username or profile ratings not found. Please try again.")
-                    st.stop()
-            with st.spinner('Getting movie details'):    
-                df_user_profile_metadata = getFilmMetadataDF(df_user_profile)
-        
-        # Check if input_type is both
-        if input_type == "both":
-            # drop rows in df_netflixhistory_metadata that exists in df_user_profile_metadata
-            df_netflixhistory_metadata = df_netflixhistory_metadata[~df_netflixhistory_metadata['IMDb_ID'].isin(df_user_profile_metadata['IMDb_ID'])]
-            # Combine netflix metadata with letterboxd metadata
-            df_user_profile_metadata = pd.concat([df_user_profile_metadata, df_netflixhistory_metadata], ignore_index=True)
-        
-        if input_type == "netflix":
-            df_user_profile_metadata = df_netflixhistory_metadata
-            df_user_profile = df_netflixhistory_metadata
+        # Function to filter movies based on user input
+        def filter_movies(df_catalog):
+            df_moviesDB = filter_year_and_rating(df_catalog, year_range_filter, rating_filter)
+            # Filter movies based on genres
+            return filter_genres(df_moviesDB, genre_filter)
+
+        # Load catalog and model while the profile is scraped, then get movie details and filter movies
+        tracker = get_progress_tracker(1)
+        progress_bar = st.progress(0.0, text="Getting your profile")
+        def show_progress():
+            fraction, status = get_member_progress(tracker)[0]
+            progress_bar.progress(min(fraction, 1.0), text=status)
+        profile_stages = load_stages + get_member_pipeline_stages([username], [netflixhistory], [input_type], tracker, full_profile=False)
+        profile_stages.append(("movies", filter_movies, ["catalog"]))
+        results, timings = run_pipeline(profile_stages, on_wait=show_progress)
+        progress_bar.empty()
+
+        if results['member_1']['error'] is not None:
+            st.error(results['member_1']['error'])
+            st.stop()
+        df_user_profile = results['member_1']['profile']
+        df_user_profile_metadata = results['member_1']['profile_metadata']
 
         # Get profile analysis
         most_watched_genre = get_most_watched_genre(df_user_profile_metadata)
@@ -179,59 +167,57 @@ if reco_type == "Individual":
         most_popular_movie = get_most_popular_movie(df_user_profile_metadata)
         least_popular_movie = get_least_popular_movie(df_user_profile_metadata)
         decade_most_movies_watched = get_decade_most_movies_watched(df_user_profile_metadata)
-            
-        #end1 = time.time()
-        #print("Scraping time: ", end1-start)
 
-            
-        with st.spinner('Getting recommendations for you'):
-            
-            # Filter movies based on user input
-            df_moviesDB = filter_year_and_rating(df_moviesDB, year_range_filter, rating_filter)
-            # Filter movies based on genres
-            df_moviesDB = filter_genres(df_moviesDB, genre_filter)
-            
-            # Collaborative Filtering - SVD
+        # Collaborative Filtering - SVD
+        def get_svd_results(df_moviesDB, svd_model, imdb_index, member):
             # Get User Rating Input DF for SVD
-            df_userRatingSVD = getUserRatingSVDDF(df_movies_db=df_moviesDB, df_user_initial=df_user_profile, username=9999999)
+            df_userRatingSVD = getUserRatingSVDDF(df_movies_db=df_moviesDB, df_user_initial=member['profile'], username=9999999, imdb_index=imdb_index)
 
             # check if df_userRatingSVD is empty
             if df_userRatingSVD.empty:
                 # add a column SVDRatings as 0 as df_SVD_Results
                 df_SVD_Results = df_moviesDB.copy()
                 df_SVD_Results['SVDRatings'] = 0
-            else:
-                # Get Average Rating of User
-                averageRating = getAverageRating(df_userRatingSVD)
-                # Combine user ratings with rating df
-                df_userRatingSVD = combineRatingsDF(df_userRatingSVD)
-                # Train SVD model
-                svd_model = trainSVDModel(df_userRatingSVD)
-                # Get List of Sorted SVD Recommendations
-                list_SVD_reco = getSVDRecommendations(data=df_userRatingSVD, df_movies=df_moviesDB, user_id=9999999, algo=svd_model)
-            
-                # Get Dataframe for SVD Recommendations
-                df_SVD_Results = get_SVD_Dataframe(sorted_recommendations=list_SVD_reco, df_movies=df_moviesDB, user_id=9999999, avgRating=averageRating)
-            
-            # Content Based Filtering - CBF
+                return df_SVD_Results
+            # Get Average Rating of User
+            averageRating = getAverageRating(df_userRatingSVD)
+            # Fold user into pretrained SVD model
+            user_bias, user_factors = foldInUser(svd_model, df_userRatingSVD)
+            # Get List of Sorted SVD Recommendations
+            list_SVD_reco = getFoldInRecommendations(svd_model, df_userRatingSVD, user_bias, user_factors)
+            # Get Dataframe for SVD Recommendations
+            return get_SVD_Dataframe(sorted_recommendations=list_SVD_reco, df_movies=df_moviesDB, user_id=9999999, avgRating=averageRating)
+
+        # Get sorted df_user_letterboxd_metadata with CBF description
+        def get_sorted_profile(member):
+            sorted_df_letterboxd = sort_rated_df(member['profile_metadata'])
+            return get_CBF_description_letterboxd(sorted_df_letterboxd)
+
+        # Content Based Filtering - CBF
+        def get_cbf_results(df_SVD_Results, sorted_df_letterboxd, catalog_tfidf):
             # Get top genres of user
             top_genres = get_top_genres(df_user_profile_metadata)
-            # Get sorted df_user_letterboxd_metadata
-            sorted_df_letterboxd = sort_rated_df(df_user_profile_metadata)
             # Get CBF description of movies
             df_SVD_Results = get_CBF_description(df_SVD_Results)
-            sorted_df_letterboxd = get_CBF_description_letterboxd(sorted_df_letterboxd)
             # Get CBF Input
             df_CBF_input = get_filtered_CBF_input(df_svd_results=df_SVD_Results, sorted_df=sorted_df_letterboxd, top_genres=top_genres)     
             # Get CBF output with cosine similarity
-            df_CBF_results = get_CBF_cosine_sim(df_movies=df_CBF_input, sorted_df=sorted_df_letterboxd)
+            df_CBF_results = get_CBF_cosine_sim(df_movies=df_CBF_input, sorted_df=sorted_df_letterboxd, catalog_tfidf=catalog_tfidf)
             # remove duplicates
             df_CBF_results = df_CBF_results.drop_duplicates(subset=['imdb_id'])
             # Get top 20 CBF recommendations
-            df_CBF_results = df_CBF_results.head(20)  
+            return df_CBF_results.head(20)
+
+        with st.spinner('Getting recommendations for you'):
+            reco_stages = [
+                ("svd", get_svd_results, ["movies", "model", "imdb_index", "member_1"]),
+                ("sorted_profile_1", get_sorted_profile, ["member_1"]),
+                ("cbf", get_cbf_results, ["svd", "sorted_profile_1", "catalog_tfidf"]),
+            ]
+            results, timings = run_pipeline(reco_stages, results, timings)
+            df_CBF_results = results['cbf']
+        print_pipeline_timings(profile_stages + reco_stages, timings)
             
-        # Reformat columns
-        df_CBF_results['languages_list'] = df_CBF_results['spoken_languages'].apply(extract_json_to_list)
         st.header("🗒️ Your Individual Recommendation")
         row_movies = {}
         # if cbf results is empty
@@ -314,14 +300,16 @@ if reco_type == "Individual":
         st.subheader("📅 Decade")
         st.markdown("You have watched the most content from the **:green[**{0}** ]**!".format(decade_most_movies_watched))
 
-# Group Recommendation (2 users)
-elif reco_type == "Group (2 users)":
+# Group Recommendation (2 or 3 users)
+elif reco_type == "Group (2 users)" or reco_type == "Group (3 users)":
+    n_members = 2 if reco_type == "Group (2 users)" else 3
+    member_labels = ['First', 'Second', 'Third'][:n_members]
     # ----- HEADER -----
     with st.container():
         st.title('🎬 WatchList')
         st.subheader("A Hybrid Recommendation System for Film and Television")
         st.markdown("Select **:green[individual 🧍]** or **:green[group 👪]** recommendation option from the side bar.")
-        st.markdown("Provide WatchList with your **:blue[Letterboxd username],** or **:blue[ Netflix Viewing History]** (csv file), or **:blue[both]**!")
+        st.markdown("Provide WatchList with your **:blue[Letterboxd usernames],** or **:blue[ Netflix Viewing History]** (csv file), or **:blue[both]**!")
         with st.expander("More Information"):
             st.write("WatchList is a hybrid recommendation system that combines **:green[collaborative filtering]** and **:green[content-based filtering]** to provide you with movie and TV recommendations.")
             st.write("")
@@ -344,19 +332,21 @@ elif reco_type == "Group (2 users)":
     with st.container():
         # create two columns for input
         row_input = st.columns((2,1,3,1))
+        usernames = []
+        netflixhistories = []
         # username input at column 1
         with row_input[0]:
-            # username input
-            username_1 = st.text_input('First User\'s Letterboxd Username')
-            st.write("")
-            st.write("") 
-            username_2 = st.text_input('Second User\'s Letterboxd Username') 
+            for member, label in enumerate(member_labels):
+                if member > 0:
+                    st.write("")
+                    st.write("")
+                # username input
+                usernames.append(st.text_input(label + ' User\'s Letterboxd Username'))
         with row_input[2]:
             # netflixhistory input
-            netflixhistory_1 = st.file_uploader('First User\'s Netflix Viewing History', type=['csv'], accept_multiple_files=False, 
-                                              help="Download your Netflix Viewing History in csv file format from your account settings.")
-            netflixhistory_2 = st.file_uploader('Second User\'s Netflix Viewing History', type=['csv'], accept_multiple_files=False, 
-                                              help="Download your Netflix Viewing History in csv file format from your account settings.")
+            for label in member_labels:
+                netflixhistories.append(st.file_uploader(label + ' User\'s Netflix Viewing History', type=['csv'], accept_multiple_files=False, 
+                                                         help="Download your Netflix Viewing History in csv file format from your account settings."))
             
         # place filtering options in a container with smaller width
         st.write("")
@@ -401,16 +391,11 @@ elif reco_type == "Group (2 users)":
 
     if result:
         st.write("---")
-        # Get Movie Database as Dataframe
-        df_moviesDB = getPyMongoDB("movies_metadata")
-        # Clean movie df
-        df_moviesDB = clean_movie_df(df_moviesDB)
         today = date.today()
-        filename = "{0}_{1}".format(str(today), username_1+"_"+username_2)
+        filename = "{0}_{1}".format(str(today), "_".join(usernames))
 
         # Check input type
-        input_type_1 = check_input_type(username_1, netflixhistory_1)
-        input_type_2 = check_input_type(username_2, netflixhistory_2)
+        input_types = [check_input_type(username, netflixhistory) for username, netflixhistory in zip(usernames, netflixhistories)]
         
         # check genre filter
         if len(genre_filter) == 0:
@@ -418,209 +403,119 @@ elif reco_type == "Group (2 users)":
             st.stop()
         
         # Check if input_type is Error
-        if input_type_1 == "Error" or input_type_2 == "Error":
+        if "Error" in input_types:
             st.error("Error. Please input Letterboxd username or Netflix Viewing History.")
             st.stop()
         
-        # Process netflix input
-        if input_type_1 == "netflix" or input_type_1 == "both":
-            # convert netflixhistory to dataframe
-            netflixhistory_1 = pd.read_csv(netflixhistory_1)
-            # check validity of netflixhistory_1
-            validity = check_netflixhistory(netflixhistory_1)
-            if validity == "invalid":
-                st.error("Error. Netflix Viewing History is invalid. Please try again.")
-                st.stop()
-            elif validity == "insufficient":
-                st.error("Error. Netflix Viewing History is insufficient. Please make sure you have viewed at least 5 titles using your Netflix account.")
-                st.stop()
-            elif validity == "valid":
-                # process netflixhistory
-                df_netflixhistory_1 = process_netflixhistory(netflixhistory_1)
-                # get netflix metadata
-                df_netflixhistory_metadata_1 = getNetflixMetadata(df_netflixhistory_1)
-        
-        if input_type_2 == "netflix" or input_type_2 == "both":
-            # convert netflixhistory to dataframe
-            netflixhistory_2 = pd.read_csv(netflixhistory_2)
-            # check validity of netflixhistory_2
-            validity = check_netflixhistory(netflixhistory_2)
-            if validity == "invalid":
-                st.error("Error. Netflix Viewing History is invalid. Please try again.")
-                st.stop()
-            elif validity == "insufficient":
-                st.error("Error. Netflix Viewing History is insufficient. Please make sure you have viewed at least 5 titles using your Netflix account.")
-                st.stop()
-            elif validity == "valid":
-                # process netflixhistory
-                df_netflixhistory_2 = process_netflixhistory(netflixhistory_2)
-                # get netflix metadata
-                df_netflixhistory_metadata_2 = getNetflixMetadata(df_netflixhistory_2)
-        
-        # Process Letterboxd input
-        if input_type_1 == "username" or input_type_1 == "both":
-            # Start scraping user profile
-            with st.spinner('Scraping '+ username_1+'\'s movies on Letterboxd'):
-                #start = time.time()
-                df_user1_profile = scrape_films_one_page(username_1)
-                # check if df_user_profile is empty
-                if df_user1_profile.empty:
-                    st.error("Error. Username or profile ratings not found. Please try again.")
-                    st.stop()
-                
-                # get full profile
-                df_full_user1_profile = scrape_all_films(username_1)
-            with st.spinner('Getting movie details'):
-                # Get film metadata through TMDB API    
-                df_user1_profile_metadata = getFilmMetadataDF(df_user1_profile)
-                
-        if input_type_2 == "username" or input_type_2 == "both":
-            with st.spinner('Scraping '+ username_2+'\'s movies on Letterboxd'):
-                df_user2_profile = scrape_films_one_page(username_2)
-                # check if df_user_profile is empty
-                if df_user2_profile.empty:
-                    st.error("Error. Username or profile ratings not found. Please try again.")
-                    st.stop()
-                
-                # get full profile
-                df_full_user2_profile = scrape_all_films(username_2)
-            
-            with st.spinner('Getting movie details'):
-                # Get film metadata through TMDB API    
-                df_user2_profile_metadata = getFilmMetadataDF(df_user2_profile)
-        
-        # Check if input_type is both
-        if input_type_1 == "both":
-            # drop rows in df_netflixhistory_metadata that exists in df_user_profile_metadata
-            df_netflixhistory_metadata_1 = df_netflixhistory_metadata_1[~df_netflixhistory_metadata_1['IMDb_ID'].isin(df_user1_profile_metadata['IMDb_ID'])]
-            # Combine netflix metadata with letterboxd metadata
-            df_user1_profile_metadata = pd.concat([df_user1_profile_metadata, df_netflixhistory_metadata_1], ignore_index=True)
-
-            # drop rows in df_netflixhistory_metadata that exists in df_full_user1_profile
-            df_netflix_full_1 = df_netflixhistory_metadata_1[~df_netflixhistory_metadata_1['title'].isin(df_full_user1_profile['title'])]
-            df_full_user1_profile = pd.concat([df_full_user1_profile, df_netflix_full_1], ignore_index=True)
-            # reset index
-            df_full_user1_profile = df_full_user1_profile.reset_index(drop=True)
-
-
-        if input_type_2 == "both":
-            # drop rows in df_netflixhistory_metadata that exists in df_user_profile_metadata
-            df_netflixhistory_metadata_2 = df_netflixhistory_metadata_2[~df_netflixhistory_metadata_2['IMDb_ID'].isin(df_user2_profile_metadata['IMDb_ID'])]
-            # Combine netflix metadata with letterboxd metadata
-            df_user2_profile_metadata = pd.concat([df_user2_profile_metadata, df_netflixhistory_metadata_2], ignore_index=True)
-
-            # drop rows in df_netflixhistory_metadata that exists in df_full_user2_profile
-            df_netflix_full_2 = df_netflixhistory_metadata_2[~df_netflixhistory_metadata_2['title'].isin(df_full_user2_profile['title'])]
-            df_full_user2_profile = pd.concat([df_full_user2_profile, df_netflix_full_2], ignore_index=True)
-            # reset index
-            df_full_user2_profile = df_full_user2_profile.reset_index(drop=True)
+        # Display names of members
+        display_names = [username if username != "" else "User " + str(member + 1) for member, username in enumerate(usernames)]
+        member_stages = ["member_" + str(member + 1) for member in range(n_members)]
 
-        if input_type_1 == "netflix":
-            df_user1_profile_metadata = df_netflixhistory_metadata_1
-            df_user1_profile = df_netflixhistory_metadata_1
-            df_full_user1_profile = df_netflixhistory_metadata_1
-        if input_type_2 == "netflix":
-            df_user2_profile_metadata = df_netflixhistory_metadata_2
-            df_user2_profile = df_netflixhistory_metadata_2
-            df_full_user2_profile = df_netflixhistory_metadata_2
+        # Function to filter movies based on user input
+        def filter_movies(df_catalog):
+            df_moviesDB = filter_year_and_rating(df_catalog, year_range_filter, rating_filter)
+            # Filter movies based on genres
+            return filter_genres(df_moviesDB, genre_filter)
+
+        # Load catalog and model while all members' profiles are scraped concurrently, then get movie details
+        # and filter movies, with one progress bar for the group
+        tracker = get_progress_tracker(n_members)
+        progress_bar = st.progress(0.0, text="Getting your profiles")
+        def show_group_progress():
+            member_progress = get_member_progress(tracker)
+            fraction = sum([progress[0] for progress in member_progress]) / len(member_progress)
+            status = " | ".join(["{0}: {1}".format(name, progress[1]) for name, progress in zip(display_names, member_progress)])
+            progress_bar.progress(min(fraction, 1.0), text=status)
+        profile_stages = load_stages + get_member_pipeline_stages(usernames, netflixhistories, input_types, tracker)
+        profile_stages.append(("movies", filter_movies, ["catalog"]))
+        results, timings = run_pipeline(profile_stages, on_wait=show_group_progress)
+        progress_bar.empty()
+        member_results = [results[stage] for stage in member_stages]
+
+        # Show errors of all members that could not be processed
+        member_errors = [(name, member_result['error']) for name, member_result in zip(display_names, member_results) if member_result['error'] is not None]
+        if len(member_errors) != 0:
+            for name, error in member_errors:
+                st.error("{0}: {1}".format(name, error))
+            st.stop()
 
-        #end1 = time.time()
-        #print("Scraping time: ", end1-start)
+        # Profiles of each member (first page ratings, full profile and first page metadata)
+        member_profiles = [member_result['profile'] for member_result in member_results]
+        member_full_profiles = [member_result['full_profile'] for member_result in member_results]
+        member_profiles_metadata = [member_result['profile_metadata'] for member_result in member_results]
 
         # Get Taste Match Score
-        genre_score = get_genre_match_score(df_user1_profile_metadata, df_user2_profile_metadata)
-        movie_score = get_movie_match_score(df_full_user1_profile, df_full_user2_profile)
-        fav_genre = get_fav_genre(df_user1_profile_metadata, df_user2_profile_metadata)
-        common_movie = get_common_movie(df_user1_profile_metadata, df_user2_profile_metadata)
+        if n_members == 2:
+            genre_score = get_genre_match_score(*member_profiles_metadata)
+            movie_score = get_movie_match_score(*member_full_profiles)
+            fav_genre = get_fav_genre(*member_profiles_metadata)
+            common_movie = get_common_movie(*member_profiles_metadata)
+        else:
+            genre_score = get_genre_match_score_3users(*member_profiles_metadata)
+            movie_score = get_movie_match_score_3users(*member_full_profiles)
+            fav_genre = get_fav_genre_3users(*member_profiles_metadata)
+            common_movie = get_common_movie_3users(*member_profiles_metadata)
 
-        expertUserCheck = check_expert_user(df_full_user1_profile, df_full_user2_profile)
+        expertUserCheck = check_expert_users(member_full_profiles)
         print(expertUserCheck)
-        
-        with st.spinner('Getting recommendations for both of you'):
-            
-            # Filter movies based on user input
-            df_moviesDB = filter_year_and_rating(df_moviesDB, year_range_filter, rating_filter)
-            # Filter movies based on genres
-            df_moviesDB = filter_genres(df_moviesDB, genre_filter)
 
-            # Collaborative Filtering - SVD
+        # Collaborative Filtering - SVD
+        def get_group_svd_results(df_moviesDB, svd_model, imdb_index, *member_results):
             # Get User Rating Input DF for SVD
-            df_user1RatingSVD = getUserRatingSVDDF(df_movies_db=df_moviesDB, df_user_initial=df_user1_profile, username=99999991)
-            df_user2RatingSVD = getUserRatingSVDDF(df_movies_db=df_moviesDB, df_user_initial=df_user2_profile, username=99999992)
+            member_ratings = [getUserRatingSVDDF(df_movies_db=df_moviesDB, df_user_initial=member_result['profile'], username=99999991 + member, imdb_index=imdb_index)
+                              for member, member_result in enumerate(member_results)]
 
             # check if any of df_userRatingSVD is empty (Skip SVD)
-            if df_user1RatingSVD.empty or df_user2RatingSVD.empty:
-                # add a column SVDRatings as 0 as df_SVD_Results
-                df_SVD_Results_1 = df_moviesDB.copy()
-                df_SVD_Results_1['SVDRatings'] = 0
-                df_SVD_Results_2 = df_moviesDB.copy()
-                df_SVD_Results_2['SVDRatings'] = 0
+            if any(df_userRatingSVD.empty for df_userRatingSVD in member_ratings):
+                # score all movies as 0
+                score_matrix = np.zeros((len(df_moviesDB), n_members), dtype=np.float32)
             else:
-                # Get Average Rating of User
-                averageRating1 = getAverageRating(df_user1RatingSVD)
-                averageRating2 = getAverageRating(df_user2RatingSVD)
-                # Combine user ratings with rating df
-                df_user1RatingSVD = combineRatingsDF(df_user1RatingSVD)
-                df_user2RatingSVD = combineRatingsDF(df_user2RatingSVD)
-
-                # Train SVD model
-                svd_model_1 = trainSVDModel(df_user1RatingSVD)
-                svd_model_2 = trainSVDModel(df_user2RatingSVD)
+                # Score movies for all users against the shared SVD model
+                score_matrix = getGroupSVDScores(svd_model, df_moviesDB, member_ratings)
 
-                # Get List of Sorted SVD Recommendations
-                list_SVD_reco_1 = getSVDRecommendations(data=df_user1RatingSVD, df_movies=df_moviesDB, user_id=99999991, algo=svd_model_1)
-                list_SVD_reco_2 = getSVDRecommendations(data=df_user2RatingSVD, df_movies=df_moviesDB, user_id=99999992, algo=svd_model_2)
-
-                # Get Dataframe for SVD Recommendations
-                df_SVD_Results_1 = get_SVD_Dataframe(sorted_recommendations=list_SVD_reco_1, df_movies=df_moviesDB, user_id=99999991, avgRating=averageRating1)
-                df_SVD_Results_2 = get_SVD_Dataframe(sorted_recommendations=list_SVD_reco_2, df_movies=df_moviesDB, user_id=99999992, avgRating=averageRating2)
+            # Get Group SVD Results
+            return getGroupSVDResults(df_moviesDB, score_matrix, getGroupWeights(expertUserCheck, n_members))
 
-                # Rearrange svd results based on id
-                df_SVD_Results_1 = df_SVD_Results_1.sort_values(by=['id'], ascending = True)
-                df_SVD_Results_2 = df_SVD_Results_2.sort_values(by=['id'], ascending = True)
+        # Get sorted letterboxd ratings with CBF description of member
+        def get_sorted_profile(member_result):
+            return get_CBF_description_letterboxd(sort_rated_df(member_result['profile_metadata']))
 
-            # Get Group SVD Results
-            df_SVD_Results_Group = getGroupSVDResults_2Users(df_SVD_Results_1, df_SVD_Results_2, expertUserCheck)
-            
-            # Content Based Filtering - CBF
+        # Content Based Filtering - CBF
+        def get_group_cbf_results(df_SVD_Results_Group, catalog_tfidf, *member_sorted_dfs):
             # Get top genres of users
-            top_genres = get_group2_top_genres(df_user1_profile_metadata, df_user2_profile_metadata)
-            # Get sorted letterboxd ratings for both users
-            sorted_df_letterboxd_1 = sort_rated_df(df_user1_profile_metadata)
-            sorted_df_letterboxd_2 = sort_rated_df(df_user2_profile_metadata)
-            
+            top_genres = get_group_top_genres(member_profiles_metadata)
             # Get CBF description of movies
             df_SVD_Results_Group = get_CBF_description(df_SVD_Results_Group)
-            sorted_df_letterboxd_1 = get_CBF_description_letterboxd(sorted_df_letterboxd_1)
-            sorted_df_letterboxd_2 = get_CBF_description_letterboxd(sorted_df_letterboxd_2)
 
             # Get CBF Input
-            df_CBF_input = get_2Group_filtered_CBF_input(df_SVD_Results_Group, sorted_df_letterboxd_1, sorted_df_letterboxd_2, top_genres)
+            df_CBF_input = get_group_filtered_CBF_input(df_SVD_Results_Group, member_sorted_dfs, top_genres)
 
             # Get group sorted group df
-            sorted_df_group = get_sorted_2group_letterboxd_df(sorted_df_letterboxd_1, sorted_df_letterboxd_2, expertUserCheck)
+            sorted_df_group = get_sorted_group_letterboxd_df(member_sorted_dfs, expertUserCheck)
 
             # Get CBF output with cosine similarity
-            df_CBF_results = get_group_CBF_cosine_sim(df_movies=df_CBF_input, sorted_df=sorted_df_group)
+            df_CBF_results = get_group_CBF_cosine_sim(df_movies=df_CBF_input, sorted_df=sorted_df_group, catalog_tfidf=catalog_tfidf)
             # remove duplicates
             df_CBF_results = df_CBF_results.drop_duplicates(subset=['imdb_id'])
             # Get top 20 CBF recommendations
-            df_CBF_results = df_CBF_results.head(20)  
-
-            #end2 = time.time()  
-            #print("Recommendation time: ", end2-end1)
-            #print("Total time: ", end2-start)
-        # Reformat columns
-        df_CBF_results['languages_list'] = df_CBF_results['spoken_languages'].apply(extract_json_to_list)
+            return df_CBF_results.head(20)
+        
+        with st.spinner('Getting recommendations for both of you' if n_members == 2 else 'Getting recommendations for your group'):
+            # SVD and each member's sorted profile are computed at the same time
+            reco_stages = [("svd", get_group_svd_results, ["movies", "model", "imdb_index"] + member_stages)]
+            sorted_profile_stages = ["sorted_profile_" + str(member + 1) for member in range(n_members)]
+            for member_stage, sorted_profile_stage in zip(member_stages, sorted_profile_stages):
+                reco_stages.append((sorted_profile_stage, get_sorted_profile, [member_stage]))
+            reco_stages.append(("cbf", get_group_cbf_results, ["svd", "catalog_tfidf"] + sorted_profile_stages))
+            results, timings = run_pipeline(reco_stages, results, timings)
+            df_CBF_results = results['cbf']
+        print_pipeline_timings(profile_stages + reco_stages, timings)
         
-        # Check username
-        if username_1 == "":
-            username_1 = "User 1"
-        if username_2 == "":
-            username_2 = "User 2"
-
         # Display Group Recommendation Results
-        st.header("🗒️ {0} and {1}'s Group Recommendation".format(username_1, username_2))
+        if n_members == 2:
+            st.header("🗒️ {0} and {1}'s Group Recommendation".format(*display_names))
+        else:
+            st.header("🗒️ {0}, and {1}'s Group Recommendation".format(", ".join(display_names[:-1]), display_names[-1]))
         # if cbf results is empty
         if df_CBF_results.empty:
             st.error("No recommendations found. You may try again by reducing the restriction in your filtering option.")
@@ -684,458 +579,38 @@ elif reco_type == "Group (2 users)":
         st.write("")
         row_group = st.columns((3,3,3))
         st.subheader("🚀 :blue[Taste Match Score: {0}%]".format(taste_match_score))
-        if taste_match_score>80:
-            st.subheader("**:green[Perfect Match ]**")
-            st.markdown("Both of your tastes in movies aligns flawlessly. You both have an exceptional understanding and appreciation for cinema, making you the 'pitch-perfect' movie-watching duo!")
-        elif taste_match_score>65:
-            st.subheader("**:green[Hollywood Elite ]**")
-            st.markdown("Your taste match scores put you in the league of Hollywood's finest. Like 'Star Wars,' you bring the epicness to your movie choices.")
-        else:
-            st.subheader("**:green[Silver Screen Explorer ]**")
-            st.markdown("You and your movie-watching partner have a good understanding of each other's tastes. You are both willing to explore different genres and discover new movies together, making you much like Katniss and Peeta from 'The Hunger Games.'")
-        st.write("")
-
-        if fav_genre != "None":
-            st.markdown("Both of you have a penchant for **:green[**{0}** ]** movies and shows!".format(fav_genre))
-        st.write("")
-
-        if common_movie != "None":
-            st.markdown("A movie or show that brings the both of you together is **:green[**{0}** ]**!".format(common_movie))
-        
-# Group Recommendation (3 users)
-elif reco_type == "Group (3 users)":
-    # ----- HEADER -----
-    with st.container():
-        st.title('🎬 WatchList')
-        st.subheader("A Hybrid Recommendation System for Film and Television")
-        st.markdown("Select **:green[individual 🧍]** or **:green[group 👪]** recommendation option from the side bar.")
-        st.markdown("Provide WatchList with your **:blue[Letterboxd usernames],** or **:blue[ Netflix Viewing History]** (csv file), or **:blue[both]**!")
-        with st.expander("More Information"):
-            st.write("WatchList is a hybrid recommendation system that combines **:green[collaborative filtering]** and **:green[content-based filtering]** to provide you with movie and TV recommendations.")
-            st.write("")
-            st.markdown("You may choose to provide WatchList with your **:blue[Letterboxd username]**, **:blue[ Netflix Viewing History]** (csv file), or both.")
-            st.write("")
-            st.markdown("If you choose to provide your **:blue[Letterboxd username]**, WatchList will scrape your profile and ratings from Letterboxd.")
-            st.write("")
-            st.markdown("If you choose to provide your **:blue[ Netflix Viewing History]**, WatchList will process your viewing history and scrape the metadata of the movies and TV shows you have watched.")
-            st.write("Due to the limitations of Netflix Viewing History, WatchList is only able to process your viewing history"+
-                     " if you have watched at least 5 titles using your Netflix account, and may be **:red[inaccurate]** in gathering the correct titles.")
-            st.write("")
-            st.markdown("**:red[Disclaimer:]** WatchList does not store your Letterboxd username, Netflix Viewing History, or any user data. WatchList is not affiliated with Letterboxd or Netflix.")
-            st.markdown("**It will take some time for WatchList to scrape your Letterboxd profile and process your Netflix Viewing History. Please be patient!**")
+        if n_members == 2:
+            if taste_match_score>80:
+                st.subheader("**:green[Perfect Match ]**")
+                st.markdown("Both of your tastes in movies aligns flawlessly. You both have an exceptional understanding and appreciation for cinema, making you the 'pitch-perfect' movie-watching duo!")
+            elif taste_match_score>65:
+                st.subheader("**:green[Hollywood Elite ]**")
+                st.markdown("Your taste match scores put you in the league of Hollywood's finest. Like 'Star Wars,' you bring the epicness to your movie choices.")
+            else:
+                st.subheader("**:green[Silver Screen Explorer ]**")
+                st.markdown("You and your movie-watching partner have a good understanding of each other's tastes. You are both willing to explore different genres and discover new movies together, making you much like Katniss and Peeta from 'The Hunger Games.'")
             st.write("")
-        # empty line
-        st.write("")
-        st.write("")
 
-    # ----- INPUT -----
-    with st.container():
-        # create two columns for input
-        row_input = st.columns((2,1,3,1))
-        # username input at column 1
-        with row_input[0]:
-            # username input
-            username_1 = st.text_input('First User\'s Letterboxd Username') 
+            if fav_genre != "None":
+                st.markdown("Both of you have a penchant for **:green[**{0}** ]** movies and shows!".format(fav_genre))
             st.write("")
-            st.write("")
-            username_2 = st.text_input('Second User\'s Letterboxd Username') 
-            st.write("")
-            st.write("")
-            username_3 = st.text_input('Third User\'s Letterboxd Username') 
-        with row_input[2]:
-            # netflixhistory input
-            netflixhistory_1 = st.file_uploader('First User\'s Netflix Viewing History', type=['csv'], accept_multiple_files=False, 
-                                              help="Download your Netflix Viewing History in csv file format from your account settings.")
-            netflixhistory_2 = st.file_uploader('Second User\'s Netflix Viewing History', type=['csv'], accept_multiple_files=False, 
-                                              help="Download your Netflix Viewing History in csv file format from your account settings.")
-            netflixhistory_3 = st.file_uploader('Third User\'s Netflix Viewing History', type=['csv'], accept_multiple_files=False, 
-                                              help="Download your Netflix Viewing History in csv file format from your account settings.")
-            
-        # place filtering options in a container with smaller width
-        st.write("")
-        st.write("")
-        st.write("")
-        with st.container():
-            # create two columns for filtering options
-            row_filter = st.columns((3,0.7,4,1))
-            
-
-            with row_filter[0]:
-                # both way slider to filter movies by year
-                year_range_filter = st.slider('Filter by year', 1900, 2023, (1900, 2023))
-                # both way slider to filter movies by rating
-                rating_filter = st.slider('Filter by average rating', min_value=0.0, max_value=10.0, value=(0.0, 10.0), step=0.1)
-            with row_filter[2]:
-                # filter movies by genre
-                genre_filter = st.multiselect('Filter by genre', ['Animation', 'Comedy', 'Family', 'Adventure', 'Fantasy', 'Romance', 'Drama', 
-                                                                        'Action', 'Crime', 'Thriller', 'Horror', 'History', 
-                                                                        'Science Fiction', 'Mystery', 'War', 
-                                                                        'Foreign', 'Music', 'Documentary', 'Western', 'TV Movie'], 
-                                                                default=['Animation', 'Comedy', 'Family', 'Adventure', 'Fantasy', 'Romance', 'Drama', 
-                                                                        'Action', 'Crime', 'Thriller', 'Horror', 'History', 
-                                                                        'Science Fiction', 'Mystery', 'War', 
-                                                                        'Foreign', 'Music', 'Documentary', 'Western', 'TV Movie'])
-        
-        st.write("")
-        st.write("")
-        #netflixhistory = st.file_uploader()
-        row_button = st.columns((4,2,2,4)) 
-        # submit and reset button in green colour
-        submit = row_button[1].button('Submit') 
-        reset = row_button[2].button('Reset')
-        result = False
-
-    if submit:
-        result = True
-
-    if reset:
-        # reset all inputs to default
-        result = False
-    
-    if result:
-        st.write("---")
-        # Get Movie Database as Dataframe
-        df_moviesDB = getPyMongoDB("movies_metadata")
-        # Clean movie df
-        df_moviesDB = clean_movie_df(df_moviesDB)
-        today = date.today()
-        filename = "{0}_{1}".format(str(today), username_1+"_"+username_2+"_"+username_3)
-
-        # Check input type
-        input_type_1 = check_input_type(username_1, netflixhistory_1)
-        input_type_2 = check_input_type(username_2, netflixhistory_2)
-        input_type_3 = check_input_type(username_3, netflixhistory_3)
-        
-        # check genre filter
-        if len(genre_filter) == 0:
-            st.error("Error. Genre filter cannot be left empty.")
-            st.stop()
-            
-        # Check if input_type is Error
-        if input_type_1 == "Error" or input_type_2 == "Error" or input_type_3 == "Error":
-            st.error("Error. Please input Letterboxd username or Netflix Viewing History.")
-            st.stop()
-        
-        # Process netflix input
-        if input_type_1 == "netflix" or input_type_1 == "both":
-            # convert netflixhistory to dataframe
-            netflixhistory_1 = pd.read_csv(netflixhistory_1)
-            # check validity of netflixhistory_1
-            validity = check_netflixhistory(netflixhistory_1)
-            if validity == "invalid":
-                st.error("Error. Netflix Viewing History is invalid. Please try again.")
-                st.stop()
-            elif validity == "insufficient":
-                st.error("Error. Netflix Viewing History is insufficient. Please make sure you have viewed at least 5 titles using your Netflix account.")
-                st.stop()
-            elif validity == "valid":
-                # process netflixhistory
-                df_netflixhistory_1 = process_netflixhistory(netflixhistory_1)
-                # get netflix metadata
-                df_netflixhistory_metadata_1 = getNetflixMetadata(df_netflixhistory_1)
-        
-        if input_type_2 == "netflix" or input_type_2 == "both":
-            # convert netflixhistory to dataframe
-            netflixhistory_2 = pd.read_csv(netflixhistory_2)
-            # check validity of netflixhistory_2
-            validity = check_netflixhistory(netflixhistory_2)
-            if validity == "invalid":
-                st.error("Error. Netflix Viewing History is invalid. Please try again.")
-                st.stop()
-            elif validity == "insufficient":
-                st.error("Error. Netflix Viewing History is insufficient. Please make sure you have viewed at least 5 titles using your Netflix account.")
-                st.stop()
-            elif validity == "valid":
-                # process netflixhistory
-                df_netflixhistory_2 = process_netflixhistory(netflixhistory_2)
-                # get netflix metadata
-                df_netflixhistory_metadata_2 = getNetflixMetadata(df_netflixhistory_2)
-        
-        if input_type_3 == "netflix" or input_type_3 == "both":
-            # convert netflixhistory to dataframe
-            netflixhistory_3 = pd.read_csv(netflixhistory_3)
-            # check validity of netflixhistory_3
-            validity = check_netflixhistory(netflixhistory_3)
-            if validity == "invalid":
-                st.error("Error. Netflix Viewing History is invalid. Please try again.")
-                st.stop()
-            elif validity == "insufficient":
-                st.error("Error. Netflix Viewing History is insufficient. Please make sure you have viewed at least 5 titles using your Netflix account.")
-                st.stop()
-            elif validity == "valid":
-                # process netflixhistory
-                df_netflixhistory_3 = process_netflixhistory(netflixhistory_3)
-                # get netflix metadata
-                df_netflixhistory_metadata_3 = getNetflixMetadata(df_netflixhistory_3)
-        
-        # Process Letterboxd input
-        if input_type_1 == "username" or input_type_1 == "both":
-            # Start scraping user profile
-            with st.spinner('Scraping '+ username_1+'\'s movies on Letterboxd'):
-                df_user1_profile = scrape_films_one_page(username_1)
-                # check if df_user_profile is empty
-                if df_user1_profile.empty:
-                    st.error("Error. Username or profile ratings not found. Please try again.")
-                    st.stop()
-                # get full profile
-                df_full_user1_profile = scrape_all_films(username_1)
-            with st.spinner('Getting movie details'):
-                # Get film metadata through TMDB API    
-                df_user1_profile_metadata = getFilmMetadataDF(df_user1_profile)
-        if input_type_2 == "username" or input_type_2 == "both":
-            with st.spinner('Scraping '+ username_2+'\'s movies on Letterboxd'):
-                df_user2_profile = scrape_films_one_page(username_2)
-                # check if df_user_profile is empty
-                if df_user2_profile.empty:
-                    st.error("Error. Username or profile ratings not found. Please try again.")
-                    st.stop()
-                # get full profile
-                df_full_user2_profile = scrape_all_films(username_2)
-            with st.spinner('Getting movie details'):
-                # Get film metadata through TMDB API    
-                df_user2_profile_metadata = getFilmMetadataDF(df_user2_profile)
-        if input_type_3 == "username" or input_type_3 == "both":
-            with st.spinner('Scraping '+ username_3+'\'s movies on Letterboxd'):
-                df_user3_profile = scrape_films_one_page(username_3)
-                # check if df_user_profile is empty
-                if df_user3_profile.empty:
-                    st.error("Error. Username or profile ratings not found. Please try again.")
-                    st.stop()
-                # get full profile
-                df_full_user3_profile = scrape_all_films(username_3)
-            
-            with st.spinner('Getting movie details'):
-                # Get film metadata through TMDB API    
-                df_user3_profile_metadata = getFilmMetadataDF(df_user3_profile)
-        
-        # Check if input_type is both
-        if input_type_1 == "both":
-            # drop rows in df_netflixhistory_metadata that exists in df_user_profile_metadata
-            df_netflixhistory_metadata_1 = df_netflixhistory_metadata_1[~df_netflixhistory_metadata_1['IMDb_ID'].isin(df_user1_profile_metadata['IMDb_ID'])]
-            # Combine netflix metadata with letterboxd metadata
-            df_user1_profile_metadata = pd.concat([df_user1_profile_metadata, df_netflixhistory_metadata_1], ignore_index=True)
-
-            # drop rows in df_netflixhistory_metadata that exists in df_full_user1_profile
-            df_netflix_full_1 = df_netflixhistory_metadata_1[~df_netflixhistory_metadata_1['title'].isin(df_full_user1_profile['title'])]
-            df_full_user1_profile = pd.concat([df_full_user1_profile, df_netflix_full_1], ignore_index=True)
-            df_full_user1_profile = df_full_user1_profile.reset_index(drop=True)
-
-        if input_type_2 == "both":
-            # drop rows in df_netflixhistory_metadata that exists in df_user_profile_metadata
-            df_netflixhistory_metadata_2 = df_netflixhistory_metadata_2[~df_netflixhistory_metadata_2['IMDb_ID'].isin(df_user2_profile_metadata['IMDb_ID'])]
-            # Combine netflix metadata with letterboxd metadata
-            df_user2_profile_metadata = pd.concat([df_user2_profile_metadata, df_netflixhistory_metadata_2], ignore_index=True)
-
-            # drop rows in df_netflixhistory_metadata that exists in df_full_user2_profile
-            df_netflix_full_2 = df_netflixhistory_metadata_2[~df_netflixhistory_metadata_2['title'].isin(df_full_user2_profile['title'])]
-            df_full_user2_profile = pd.concat([df_full_user2_profile, df_netflix_full_2], ignore_index=True)
-            df_full_user2_profile = df_full_user2_profile.reset_index(drop=True)
-
-        if input_type_3 == "both":
-            # drop rows in df_netflixhistory_metadata that exists in df_user_profile_metadata
-            df_netflixhistory_metadata_3 = df_netflixhistory_metadata_3[~df_netflixhistory_metadata_3['IMDb_ID'].isin(df_user3_profile_metadata['IMDb_ID'])]
-            # Combine netflix metadata with letterboxd metadata
-            df_user3_profile_metadata = pd.concat([df_user3_profile_metadata, df_netflixhistory_metadata_3], ignore_index=True)
-
-            # drop rows in df_netflixhistory_metadata that exists in df_full_user3_profile
-            df_netflix_full_3 = df_netflixhistory_metadata_3[~df_netflixhistory_metadata_3['title'].isin(df_full_user3_profile['title'])]
-            df_full_user3_profile = pd.concat([df_full_user3_profile, df_netflix_full_3], ignore_index=True)
-            df_full_user3_profile = df_full_user3_profile.reset_index(drop=True)
-        
-        if input_type_1 == "netflix":
-            df_user1_profile_metadata = df_netflixhistory_metadata_1
-            df_user1_profile = df_netflixhistory_metadata_1
-            df_full_user1_profile = df_netflixhistory_metadata_1
-        if input_type_2 == "netflix":
-            df_user2_profile_metadata = df_netflixhistory_metadata_2
-            df_user2_profile = df_netflixhistory_metadata_2
-            df_full_user2_profile = df_netflixhistory_metadata_2
-        if input_type_3 == "netflix":
-            df_user3_profile_metadata = df_netflixhistory_metadata_3
-            df_user3_profile = df_netflixhistory_metadata_3
-            df_full_user3_profile = df_netflixhistory_metadata_3
-        
-        # Get Taste Match Score
-        genre_score = get_genre_match_score_3users(df_user1_profile_metadata, df_user2_profile_metadata, df_user3_profile_metadata)
-        movie_score = get_movie_match_score_3users(df_full_user1_profile, df_full_user2_profile, df_full_user3_profile)
-        fav_genre = get_fav_genre_3users(df_user1_profile_metadata, df_user2_profile_metadata, df_user3_profile_metadata)
-        common_movie = get_common_movie_3users(df_user1_profile_metadata, df_user2_profile_metadata, df_user3_profile_metadata)
 
-        expertUserCheck = check_expert_user_3users(df_user1_profile_metadata, df_user2_profile_metadata, df_user3_profile_metadata)
-        print(expertUserCheck)
-        with st.spinner('Getting recommendations for your group'):
-            
-            # Filter movies based on user input
-            df_moviesDB = filter_year_and_rating(df_moviesDB, year_range_filter, rating_filter)
-            # Filter movies based on genres
-            df_moviesDB = filter_genres(df_moviesDB, genre_filter)
-
-            # Collaborative Filtering - SVD
-            # Get User Rating Input DF for SVD
-            df_user1RatingSVD = getUserRatingSVDDF(df_movies_db=df_moviesDB, df_user_initial=df_user1_profile, username=99999991)
-            df_user2RatingSVD = getUserRatingSVDDF(df_movies_db=df_moviesDB, df_user_initial=df_user2_profile, username=99999992)
-            df_user3RatingSVD = getUserRatingSVDDF(df_movies_db=df_moviesDB, df_user_initial=df_user3_profile, username=99999993)
-
-            # check if any of df_userRatingSVD is empty (Skip SVD)
-            if df_user1RatingSVD.empty or df_user2RatingSVD.empty or df_user3RatingSVD.empty:
-                # add a column SVDRatings as 0 as df_SVD_Results
-                df_SVD_Results_1 = df_moviesDB.copy()
-                df_SVD_Results_1['SVDRatings'] = 0
-                df_SVD_Results_2 = df_moviesDB.copy()
-                df_SVD_Results_2['SVDRatings'] = 0
-                df_SVD_Results_3 = df_moviesDB.copy()
-                df_SVD_Results_3['SVDRatings'] = 0
+            if common_movie != "None":
+                st.markdown("A movie or show that brings the both of you together is **:green[**{0}** ]**!".format(common_movie))
+        else:
+            if taste_match_score>75:
+                st.subheader("**:green[Perfect Match ]**")
+                st.markdown("All three of your tastes in movies aligns flawlessly. You have an exceptional understanding and appreciation for cinema, making you the 'pitch-perfect' movie-watching trio!")
+            elif taste_match_score>55:
+                st.subheader("**:green[Hollywood Elite ]**")
+                st.markdown("Your taste match scores put your group in the league of Hollywood's finest. Like 'Star Wars,' you bring the epicness to your content choices.")
             else:
-                # get average rating of user
-                averageRating1 = getAverageRating(df_user1RatingSVD)
-                averageRating2 = getAverageRating(df_user2RatingSVD)
-                averageRating3 = getAverageRating(df_user3RatingSVD)
-
-                # Combine user ratings with rating df
-                df_user1RatingSVD = combineRatingsDF(df_user1RatingSVD)
-                df_user2RatingSVD = combineRatingsDF(df_user2RatingSVD)
-                df_user3RatingSVD = combineRatingsDF(df_user3RatingSVD)
-
-                # Train SVD model
-                svd_model_1 = trainSVDModel(df_user1RatingSVD)
-                svd_model_2 = trainSVDModel(df_user2RatingSVD)
-                svd_model_3 = trainSVDModel(df_user3RatingSVD)
-
-                # Get List of Sorted SVD Recommendations
-                list_SVD_reco_1 = getSVDRecommendations(data=df_user1RatingSVD, df_movies=df_moviesDB, user_id=99999991, algo=svd_model_1)
-                list_SVD_reco_2 = getSVDRecommendations(data=df_user2RatingSVD, df_movies=df_moviesDB, user_id=99999992, algo=svd_model_2)
-                list_SVD_reco_3 = getSVDRecommendations(data=df_user3RatingSVD, df_movies=df_moviesDB, user_id=99999993, algo=svd_model_3)
-
-                # Get Dataframe for SVD Recommendations
-                df_SVD_Results_1 = get_SVD_Dataframe(sorted_recommendations=list_SVD_reco_1, df_movies=df_moviesDB, user_id=99999991, avgRating=averageRating1)
-                df_SVD_Results_2 = get_SVD_Dataframe(sorted_recommendations=list_SVD_reco_2, df_movies=df_moviesDB, user_id=99999992, avgRating=averageRating2)
-                df_SVD_Results_3 = get_SVD_Dataframe(sorted_recommendations=list_SVD_reco_3, df_movies=df_moviesDB, user_id=99999993, avgRating=averageRating3)
-
-                # Rearrange svd results based on id
-                df_SVD_Results_1 = df_SVD_Results_1.sort_values(by=['id'], ascending = True)
-                df_SVD_Results_2 = df_SVD_Results_2.sort_values(by=['id'], ascending = True)
-                df_SVD_Results_3 = df_SVD_Results_3.sort_values(by=['id'], ascending = True)
-
-            # Get Group SVD Results
-            df_SVD_Results_Group = getGroupSVDResults_3Users(df_SVD_Results_1, df_SVD_Results_2, df_SVD_Results_3, expertUserCheck)
-            
-            # Content Based Filtering - CBF
-            # Get top genres of users
-            top_genres = get_group3_top_genres(df_user1_profile_metadata, df_user2_profile_metadata, df_user3_profile_metadata)
-            # Get sorted letterboxd ratings for both users
-            sorted_df_letterboxd_1 = sort_rated_df(df_user1_profile_metadata)
-            sorted_df_letterboxd_2 = sort_rated_df(df_user2_profile_metadata)
-            sorted_df_letterboxd_3 = sort_rated_df(df_user3_profile_metadata)
-
-            # Get CBF description of movies
-            df_SVD_Results_Group = get_CBF_description(df_SVD_Results_Group)
-            sorted_df_letterboxd_1 = get_CBF_description_letterboxd(sorted_df_letterboxd_1)
-            sorted_df_letterboxd_2 = get_CBF_description_letterboxd(sorted_df_letterboxd_2)
-            sorted_df_letterboxd_3 = get_CBF_description_letterboxd(sorted_df_letterboxd_3)
-
-            # Get CBF Input
-            df_CBF_input = get_3Group_filtered_CBF_input(df_SVD_Results_Group, sorted_df_letterboxd_1, sorted_df_letterboxd_2, sorted_df_letterboxd_3, top_genres)
-
-            # Get group sorted group df
-            sorted_df_group = get_sorted_3group_letterboxd_df(sorted_df_letterboxd_1, sorted_df_letterboxd_2, sorted_df_letterboxd_3, expertUserCheck)
-
-            # Get CBF output with cosine similarity
-            df_CBF_results = get_group_CBF_cosine_sim(df_movies=df_CBF_input, sorted_df=sorted_df_group)
-            # remove duplicates
-            df_CBF_results = df_CBF_results.drop_duplicates(subset=['imdb_id'])
-            # Get top 20 CBF recommendations
-            df_CBF_results = df_CBF_results.head(20)  
-
-            
-        # Reformat columns
-        df_CBF_results['languages_list'] = df_CBF_results['spoken_languages'].apply(extract_json_to_list)
-        
-
-        # Check username
-        if username_1 == "":
-            username_1 = "User 1"
-        if username_2 == "":
-            username_2 = "User 2"
-        if username_3 == "":
-            username_3 = "User 3"
-        # Display Group Recommendation Results
-        st.header("🗒️ {0}, {1}, and {2}'s Group Recommendation".format(username_1, username_2, username_3))
-        # if cbf results is empty
-        if df_CBF_results.empty:
-            st.error("No recommendations found. You may try again by reducing the restriction in your filtering option.")
-            st.stop()
-        row_movies = {}
-        for i, movie in enumerate(df_CBF_results['title']):
-            if (i>=10):
-                break
-            row = int(i/2)
-            if (i%2!=1): 
-                row_movies[row] = st.columns(2)
-            col = i%2
-            # Print details of recommended movie
-            url = "https://www.imdb.com/title/" + df_CBF_results['imdb_id'].values[i] +"/"
-            row_movies[row][col].subheader("[{0}]({1})".format(movie, url))
-            print_year = df_CBF_results['year'].values[i]
-            print_year = "{:.0f}".format(print_year)
-            row_movies[row][col].write("⭐Average Rating: {0}".format(df_CBF_results['vote_average'].values[i])+" | 📅Release Year: {0}".format(print_year))
-            print_genre = ""
-            for genre in df_CBF_results['genres_list'].values[i]:
-                print_genre += genre + ", "
-            print_genre = print_genre[:-2]
-            row_movies[row][col].write("🎭Genres: {0}".format(print_genre))
-            print_lang = ""
-            for lang in df_CBF_results['languages_list'].values[i]:
-                print_lang += lang + ", "
-            print_lang = print_lang[:-2]
-            row_movies[row][col].write("🗣️Languages: {0}".format(print_lang))
-
-            # Display movie poster
-            poster_path = get_poster_path(df_CBF_results['imdb_id'].values[i])
-            image_url = "https://image.tmdb.org/t/p/original"+poster_path
-            
-
-        with st.expander("See full list of recommendations"):
-            
-            # get necessary columns for display
-            df_CBF_results = df_CBF_results[['title', 'year', 'vote_average', 'genres_list', 'languages_list', 'imdb_id']]
-            # reset index
-            df_CBF_results = df_CBF_results.reset_index(drop=True)
+                st.subheader("**:green[Silver Screen Explorer ]**")
+                st.markdown("You and your movie-watching partners have a good understanding of each other's tastes. You are all willing to explore different genres and discover new movies together, making you much like Harry, Ron, and Hermione from 'Harry Potter'.")
+            st.write("")
+            if fav_genre != "None":
+                st.markdown("All three of you have a penchant for **:green[**{0}** ]** movies and shows!".format(fav_genre))
             st.write("")
-            st.dataframe(df_CBF_results)
-            def convert_df(df_recom):
-                return df_recom.to_csv(index=False).encode('utf-8')
-            csv = convert_df(df_CBF_results)
-            st.download_button(
-                "Download Recommenations",
-                csv,
-                "{}_Movie Recommendations.csv".format(filename),
-                "text/csv",
-                key='download-csv'
-            )
-        
-        st.write("---")
-        st.header("📊 Your Group Analysis")
-        movie_score = movie_score*1.5
-        if movie_score > 50:
-            movie_score = 50
-        taste_match_score = genre_score + movie_score
-        st.write("")
-        row_group = st.columns((3,3,3))
-        st.subheader("🚀 :blue[Taste Match Score: {0}%]".format(taste_match_score))
-        if taste_match_score>75:
-            st.subheader("**:green[Perfect Match ]**")
-            st.markdown("All three of your tastes in movies aligns flawlessly. You have an exceptional understanding and appreciation for cinema, making you the 'pitch-perfect' movie-watching trio!")
-        elif taste_match_score>55:
-            st.subheader("**:green[Hollywood Elite ]**")
-            st.markdown("Your taste match scores put your group in the league of Hollywood's finest. Like 'Star Wars,' you bring the epicness to your content choices.")
-        else:
-            st.subheader("**:green[Silver Screen Explorer ]**")
-            st.markdown("You and your movie-watching partners have a good understanding of each other's tastes. You are all willing to explore different genres and discover new movies together, making you much like Harry, Ron, and Hermione from 'Harry Potter'.")
-        st.write("")
-        if fav_genre != "None":
-            st.markdown("All three of you have a penchant for **:green[**{0}** ]** movies and shows!".format(fav_genre))
-        st.write("")
 
-        if common_movie != "None":
-            st.markdown("A movie or show that brings the three of you together is **:green[**{0}** ]**!".format(common_movie))
-        
\ No newline at end of file
+            if common_movie != "None":
+                st.markdown("A movie or show that brings the three of you together is **:green[**{0}** ]**!".format(common_movie))
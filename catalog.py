@@ -0,0 +1,149 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import streamlit as st
+
+from individual_reco import getPyMongoDBFiltered, getImdbIndex, add_CBF_description, fit_CBF_tfidf
+from preprocessing import clean_movie_df
+from title_matcher import build_title_index
+
+# Columns holding parsed lists (see preprocessing.parse_catalog_fields), converted back from arrays to lists after loading
+LIST_COLUMNS = ['genres_list', 'languages_list']
+
+# Bump CATALOG_VERSION whenever the cleaning steps change so that old snapshots are rebuilt
+CATALOG_VERSION = 7
+CATALOG_DIR = "catalog_snapshot"
+
+# Columns of movies_metadata used by the recommendation and display steps
+CATALOG_COLUMNS = ['id', 'imdb_id', 'title', 'overview', 'tagline', 'genres', 'spoken_languages', 'release_date',
+                   'vote_average', 'vote_count', 'popularity', 'adult', 'original_language', 'poster_path']
+# Columns stored as numbers in the snapshot
+NUMERIC_COLUMNS = ['id', 'popularity', 'vote_average', 'vote_count']
+
+
+# Function to get file path of the current catalog snapshot
+def get_catalog_path():
+    return os.path.join(CATALOG_DIR, "catalog_v{0}.arrow".format(CATALOG_VERSION))
+
+# Function to convert cleaned catalog into column types that can be stored in Arrow
+def prepare_catalog_columns(df):
+    for column in NUMERIC_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    # drop rows with no valid id
+    df = df.dropna(subset=['id'])
+    df['id'] = df['id'].astype('int64')
+    # convert release date to datetime once
+    df['release_date'] = pd.to_datetime(df['release_date'], errors='coerce')
+
+    # store remaining mixed columns as strings, keeping missing values
+    for column in df.columns:
+        if df[column].dtype == object and column not in LIST_COLUMNS:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+            df[column] = df[column].where(df[column].notna(), None)
+    df = df.reset_index(drop=True)
+    # position of the row in the snapshot, which is the row of the catalog TF-IDF matrix
+    df['catalog_row'] = np.arange(len(df), dtype=np.int64)
+    return df
+
+# Function to get file path of the TF-IDF model of the current catalog snapshot
+def get_tfidf_path():
+    return os.path.join(CATALOG_DIR, "tfidf_v{0}.pkl".format(CATALOG_VERSION))
+
+# Function to build catalog snapshot from PyMongo and write it to disk
+def build_catalog_snapshot():
+    # Get Movie Database as Dataframe
+    df_moviesDB = getPyMongoDBFiltered("movies_metadata", columns=CATALOG_COLUMNS)
+    # Clean movie df
+    df_moviesDB = clean_movie_df(df_moviesDB)
+    # Get CBF description of movies
+    df_moviesDB = add_CBF_description(df_moviesDB)
+    df_moviesDB = prepare_catalog_columns(df_moviesDB)
+
+    os.makedirs(CATALOG_DIR, exist_ok=True)
+    path = get_catalog_path()
+    # write to temporary file first so readers never see a half written snapshot
+    tmp_path = path + ".tmp"
+    # snapshot is left uncompressed so that it can be memory-mapped
+    feather.write_feather(df_moviesDB, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    # TF-IDF rows follow the snapshot rows, so it is rebuilt with every snapshot
+    build_catalog_tfidf(df_moviesDB)
+    return path
+
+# Function to mark numeric and date columns of catalog as read-only (writing to them raises ValueError)
+def make_read_only(df_catalog):
+    columns = []
+    for column in df_catalog.columns:
+        series = df_catalog[column]
+        if series.dtype != object:
+            values = series.to_numpy()
+            values.flags.writeable = False
+            series = pd.Series(values, index=df_catalog.index, name=column, copy=False)
+        columns.append(series)
+    # concat without copy keeps the read-only arrays
+    return pd.concat(columns, axis=1, copy=False)
+
+# Function to load catalog snapshot (built once and shared by all sessions)
+# The frame is shared, so callers must not modify it: filtering returns new frames.
+# Numeric and date columns are read-only. Those without nulls (e.g. id, vote_count, genre_mask, catalog_row)
+# are zero-copy views of the memory-mapped snapshot, those with nulls (e.g. vote_average, release_date) are
+# converted to read-only copies. String and list columns are converted to Python objects on the heap
+@st.cache_resource(show_spinner=False)
+def load_catalog():
+    path = get_catalog_path()
+    if not os.path.exists(path):
+        print("Building catalog snapshot: " + path)
+        build_catalog_snapshot()
+    table = feather.read_table(path, memory_map=True)
+    # one block per column so that columns without nulls are not copied into consolidated blocks
+    df_catalog = table.to_pandas(split_blocks=True)
+    for column in LIST_COLUMNS:
+        df_catalog[column] = df_catalog[column].apply(list)
+    return make_read_only(df_catalog)
+
+# Function to get index of catalog movie id by imdb id (built once per catalog)
+@st.cache_resource(show_spinner=False)
+def get_imdb_index():
+    return getImdbIndex(load_catalog())
+
+# Function to get normalised title index of catalog movies (built once per catalog)
+@st.cache_resource(show_spinner=False)
+def get_title_index():
+    return build_title_index(load_catalog())
+
+# Function to fit TF-IDF model over the catalog and write it to disk
+def build_catalog_tfidf(df_catalog):
+    # one row per catalog row (in catalog_row order), rows with no description are left empty
+    catalog_tfidf = fit_CBF_tfidf(df_catalog.sort_values('catalog_row')['CBF_description'])
+
+    path = get_tfidf_path()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(catalog_tfidf, file)
+    os.replace(tmp_path, path)
+    return catalog_tfidf
+
+# Function to load TF-IDF model of the catalog as (vectorizer, matrix with one row per catalog row)
+# The model is refitted if it is missing or its rows do not match the loaded snapshot
+@st.cache_resource(show_spinner=False)
+def load_catalog_tfidf():
+    path = get_tfidf_path()
+    df_catalog = load_catalog()
+    if not os.path.exists(path):
+        print("Fitting catalog TF-IDF: " + path)
+        return build_catalog_tfidf(df_catalog)
+    with open(path, 'rb') as file:
+        catalog_tfidf = pickle.load(file)
+    if catalog_tfidf[1].shape[0] != len(df_catalog):
+        print("Catalog TF-IDF has {0} rows but the catalog has {1}, refitting: {2}".format(catalog_tfidf[1].shape[0], len(df_catalog), path))
+        return build_catalog_tfidf(df_catalog)
+    return catalog_tfidf
+
+
+if __name__ == "__main__":
+    # Rebuild catalog snapshot and TF-IDF model offline with: python catalog.py
+    print("Catalog snapshot written to " + build_catalog_snapshot())
+    print("Catalog TF-IDF written to " + get_tfidf_path())
@@ -0,0 +1,35 @@
+import numpy as np
+
+# Genre vocabulary (TMDb movie genres followed by TV-only genres), genre id is the position in the list
+GENRE_VOCAB = ['Animation', 'Comedy', 'Family', 'Adventure', 'Fantasy', 'Romance', 'Drama',
+               'Action', 'Crime', 'Thriller', 'Horror', 'History',
+               'Science Fiction', 'Mystery', 'War',
+               'Foreign', 'Music', 'Documentary', 'Western', 'TV Movie',
+               'Action & Adventure', 'Kids', 'News', 'Reality', 'Sci-Fi & Fantasy', 'Soap', 'Talk', 'War & Politics']
+GENRE_IDS = {genre: genre_id for genre_id, genre in enumerate(GENRE_VOCAB)}
+# Genre id used for genre names that are not in GENRE_VOCAB
+OTHER_GENRE_ID = 31
+
+
+# Function to get genre bitmask of list of genre names (one bit per genre id)
+def get_genre_mask(genres_list):
+    mask = 0
+    for genre in genres_list:
+        mask |= 1 << GENRE_IDS.get(genre, OTHER_GENRE_ID)
+    return np.uint32(mask)
+
+# Function to get genre bitmask column of comma separated genre strings (e.g. "Drama,Crime")
+def get_genre_masks(genres):
+    genres = genres.fillna('')
+    masks = genres.apply(lambda x: get_genre_mask([genre for genre in x.split(",") if genre != '']))
+    return masks.astype(np.uint32)
+
+# Function to get bitmask of genres matched by any of the given names,
+# where a name matches every genre containing it (same as str.contains('|'.join(genre_names)))
+def get_genre_pattern_mask(genre_names):
+    mask = 0
+    for name in genre_names:
+        for genre, genre_id in GENRE_IDS.items():
+            if name in genre:
+                mask |= 1 << genre_id
+    return np.uint32(mask)
@@ -1,227 +1,127 @@
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
 import nltk
 from nltk.corpus import stopwords
+from genres import get_genre_pattern_mask
+from individual_reco import get_CBF_scores, getAverageRating, getInnerItemIds, foldInUser
 
 
-# Function to check who is expert user for 2 users
-def check_expert_user(df_full_user1, df_full_user2):
-    # count items
-    count_user1 = df_full_user1['title'].count()
-    count_user2 = df_full_user2['title'].count()
-    # if one user has 70% of the total items, return the user as expert
-    if count_user1 > count_user2:
-        if count_user1/(count_user2+count_user1) >= 0.7:
-            return "user1"
-        else:
-            return "no expert"
-    elif count_user2 > count_user1:
-        if count_user2/(count_user2+count_user1) >= 0.7:
-            return "user2"
-        else:
-            return "no expert"
-    else:
-        return "no expert"
-    
-# Function to check who is expert user for 3 users
-def check_expert_user_3users(df_full_user1, df_full_user2, df_full_user3):
-    # count items
-    count_user1 = df_full_user1['title'].count()
-    count_user2 = df_full_user2['title'].count()
-    count_user3 = df_full_user3['title'].count()
+# Share of the group's titles a member needs to be the expert user by group size,
+# larger groups need 1.5 times an equal share
+EXPERT_USER_SHARES = {2: 0.7, 3: 0.5}
 
-    # if one user has 50% of the total items, return the user as expert
-    if count_user1 > count_user2 and count_user1 > count_user3:
-        if count_user1/(count_user2 + count_user3+count_user1) >= 0.5:
-            return "user1"
-        else:
-            return "no expert"
-    elif count_user2 > count_user1 and count_user2 > count_user3:
-        if count_user2/(count_user1 + count_user3+count_user2) >= 0.5:
-            return "user2"
-        else:
-            return "no expert"
-    elif count_user3 > count_user1 and count_user3 > count_user2:
-        if count_user3/(count_user1 + count_user2+count_user3) >= 0.5:
-            return "user3"
-        else:
-            return "no expert"
-    else:
+# Function to check who is expert user of group ("no expert", "user1", "user2", ...)
+# The member with the most titles is the expert if no other member has as many and their share of the group's titles is high enough
+def check_expert_users(member_profiles):
+    n_members = len(member_profiles)
+    counts = np.array([df_full_user['title'].count() for df_full_user in member_profiles])
+    expert = counts.argmax()
+    if counts.sum() == 0 or (counts == counts[expert]).sum() > 1:
         return "no expert"
-    
-# Get SVD Results for 2 users
-def getGroupSVDResults_2Users(df_SVD_Result_1, df_SVD_Result_2, expertUserCheck):
-    # Rename SVDRatings column
-    df_SVD_Result_1 = df_SVD_Result_1.rename(columns={'SVDRatings': 'SVDRatings_1'})
-    df_SVD_Result_2 = df_SVD_Result_2.rename(columns={'SVDRatings': 'SVDRatings_2'})
-    # add SVDRatings_2 to df_SVD_Result_1
-    df_SVD_Result_1['SVDRatings_2'] = df_SVD_Result_2['SVDRatings_2']
-    # copy df_SVD_Result_1 as df_SVD_Result_Group
-    df_SVD_Result_Group = df_SVD_Result_1.copy()
-
-    # calculate Group SVDRatings
+    if counts[expert] / counts.sum() >= EXPERT_USER_SHARES.get(n_members, 1.5 / n_members):
+        return "user" + str(expert + 1)
+    return "no expert"
+
+# Function to score movies for all group members against one shared model in a single pass
+# member_ratings is a list of user rating dfs (movieId, rating), one per member
+# Returns float32 matrix with one row per movie in df_movies and one column per member,
+# movies rated by the member or not in the model get the member's average rating
+def getGroupSVDScores(model, df_movies, member_ratings):
+    n_members = len(member_ratings)
+    # fold every member into the model
+    user_biases = np.zeros(n_members)
+    user_factors = np.zeros((model['qi'].shape[1], n_members))
+    for member, df_user in enumerate(member_ratings):
+        user_biases[member], user_factors[:, member] = foldInUser(model, df_user)
+
+    inner_ids = getInnerItemIds(model, df_movies['id'])
+    known = inner_ids >= 0
+    inner_ids = inner_ids[known]
+    # mu + b_u + b_i + q_i . p_u for all movies and members as one matrix product, clipped to rating scale
+    low, high = model['rating_scale']
+    est = model['global_mean'] + user_biases[np.newaxis, :] + model['bi'][inner_ids, np.newaxis] + model['qi'][inner_ids] @ user_factors
+    est = np.clip(est, low, high)
+
+    average_ratings = np.array([getAverageRating(df_user) for df_user in member_ratings], dtype=np.float32)
+    scores = np.tile(average_ratings, (len(df_movies), 1))
+    scores[known] = est
+    # movies rated by the member are not predicted
+    movie_ids = df_movies['id'].values
+    for member, df_user in enumerate(member_ratings):
+        scores[np.isin(movie_ids, df_user['movieId'].values), member] = average_ratings[member]
+    return scores
+
+# Weight of the expert user's scores by group size, the other members share the rest equally
+# (larger groups give the expert 1.2 times an equal share)
+GROUP_EXPERT_WEIGHTS = {2: 0.55, 3: 0.4}
+
+# Function to get weight of each member's scores from check_expert_users result ("no expert", "user1", "user2", ...)
+def getGroupWeights(expertUserCheck, n_members):
     if expertUserCheck == "no expert" or expertUserCheck == None:
-        # create a new column SVDRatings_Group to store the average of SVDRatings_1, SVDRatings_2
-        df_SVD_Result_Group['SVDRatings_Group'] = df_SVD_Result_Group[['SVDRatings_1', 'SVDRatings_2']].mean(axis=1)
-    elif expertUserCheck == "user1":
-        # create a new column SVDRatings_Group that is 55% of SVDRatings_1 column and 45% of SVDRatings_2 column
-        df_SVD_Result_Group['SVDRatings_Group'] = (df_SVD_Result_Group['SVDRatings_1'] * 0.55) + (df_SVD_Result_Group['SVDRatings_2'] * 0.45)
-    elif expertUserCheck == "user2":
-        # create a new column SVDRatings_Group to store the 55% of SVDRatings_2 and 45% of SVDRatings_1
-        df_SVD_Result_Group['SVDRatings_Group'] = (df_SVD_Result_Group['SVDRatings_2'] * 0.55) + (df_SVD_Result_Group['SVDRatings_1'] * 0.45)
+        return np.full(n_members, 1 / n_members, dtype=np.float32)
+    expert = int(expertUserCheck.replace("user", "")) - 1
+    expert_weight = GROUP_EXPERT_WEIGHTS.get(n_members, 1.2 / n_members)
+    weights = np.full(n_members, (1 - expert_weight) / (n_members - 1), dtype=np.float32)
+    weights[expert] = expert_weight
+    return weights
+
+# Get Group SVD Results as weighted sum of members' scores (score_matrix from getGroupSVDScores)
+def getGroupSVDResults(df_movies, score_matrix, weights):
+    df_SVD_Result_Group = df_movies.assign(SVDRatings_Group=score_matrix @ weights)
     # rearrange df_SVD_Result_Group columns based on SVDRatings_Group
     df_SVD_Result_Group = df_SVD_Result_Group.sort_values(by=['SVDRatings_Group'], ascending=False)
     return df_SVD_Result_Group
 
-# Get top 5 genres of movies in df_user_letterboxd (for 2 users)
-def get_group2_top_genres(df_letterboxd_1, df_letterboxd_2):
-    # combine all sorted dfs
-    df_group_letterboxd = pd.concat([df_letterboxd_1, df_letterboxd_2], ignore_index=True)
-    genres = []
-    for index, row in df_group_letterboxd.iterrows():
-        if row['genres'] != '':
-            list_of_genres = row['genres'].split(",")
-            for genre in list_of_genres:
-                genres.append(genre)
-    genres = ' '.join(genres) # convert list of lists to list of strings
-    genres = genres.split(" ")
+# Get top 5 genres of movies watched by the group (member_dfs is a list of profile metadata dfs, one per member)
+def get_group_top_genres(member_dfs):
+    # combine genres of all members
+    genres = pd.concat([df_letterboxd['genres'] for df_letterboxd in member_dfs], ignore_index=True)
+    genres = genres[genres != '']
+    # split on commas and spaces
+    genres = ' '.join(genres).replace(',', ' ').split(" ")
     genres = nltk.FreqDist(genres)
     top_genres = genres.most_common(5)
     top_genres = [genre[0] for genre in top_genres]
     return top_genres
 
-# Function to get CBF input for 2 group user
-def get_2Group_filtered_CBF_input(df_svd_results, sorted_df1, sorted_df2, top_genres):
+# Function to get CBF input for group (member_sorted_dfs is a list of sorted letterboxd dfs, one per member)
+def get_group_filtered_CBF_input(df_svd_results, member_sorted_dfs, top_genres, limit=250):
     # Sort df_svd_results according to SVDRatings
     df_svd_results = df_svd_results.sort_values(by=['SVDRatings_Group','popularity','vote_average','vote_count'], ascending = [False, False, False, False])
     # Drop rows of movies that do not belong in top_genres
-    df_svd_results = df_svd_results[df_svd_results['genres'].str.contains('|'.join(top_genres))]
+    df_svd_results = df_svd_results[(df_svd_results['genre_mask'] & get_genre_pattern_mask(top_genres)) != 0]
     # Drop rows of movies with vote_count < 50
     df_svd_results = df_svd_results[df_svd_results['vote_count'] > 50]
-    # Drop rows of movies with same imdb_id values in df_user_letterboxd
-    df_svd_results = df_svd_results[~df_svd_results['imdb_id'].isin(sorted_df1['IMDb_ID'])]
-    df_svd_results = df_svd_results[~df_svd_results['imdb_id'].isin(sorted_df2['IMDb_ID'])]
-    # Return top 250 movies in df_svd_results
-    df_svd_results = df_svd_results.head(250)
+    # Drop rows of movies with same imdb_id values as any member's letterboxd df
+    watched_ids = np.concatenate([sorted_df['IMDb_ID'].values for sorted_df in member_sorted_dfs])
+    df_svd_results = df_svd_results[~df_svd_results['imdb_id'].isin(watched_ids)]
+    # Return top movies in df_svd_results (limit=None keeps every candidate)
+    if limit is not None:
+        df_svd_results = df_svd_results.head(limit)
     return df_svd_results
 
-# Get sorted group letterboxd df for 2 users
-def get_sorted_2group_letterboxd_df(sorted_df_letterboxd_1, sorted_df_letterboxd_2, expertUserCheck):
+# Function to get number of top rated titles taken from each member's sorted df
+# 5 each without expert, otherwise 4 for each other member and the rest of the 5 per member for the expert
+def get_group_exemplar_counts(n_members, expertUserCheck):
     if expertUserCheck == "no expert" or expertUserCheck == None:
-        # get top 5 of both dfs
-        sorted_group_df = pd.concat([sorted_df_letterboxd_1.head(5), sorted_df_letterboxd_2.head(5)], ignore_index=True)
-    elif expertUserCheck == "user1":
-        # get top 6 for expert, top 4 for non-expert of both dfs
-        sorted_group_df = sorted_df_letterboxd_1.head(6).append(sorted_df_letterboxd_2.head(4), ignore_index=True)
-    elif expertUserCheck == "user2":
-        # get top 6 for expert, top 4 for non-expert of both dfs
-        sorted_group_df = pd.concat([sorted_df_letterboxd_2.head(6), sorted_df_letterboxd_1.head(4)], ignore_index=True)
+        return np.full(n_members, 5)
+    expert = int(expertUserCheck.replace("user", "")) - 1
+    counts = np.full(n_members, 4)
+    counts[expert] = 5 * n_members - 4 * (n_members - 1)
+    return counts
+
+# Get sorted group letterboxd df (expert's titles first, then the other members' in order)
+def get_sorted_group_letterboxd_df(member_sorted_dfs, expertUserCheck):
+    counts = get_group_exemplar_counts(len(member_sorted_dfs), expertUserCheck)
+    # stable sort keeps members in order behind the expert
+    order = np.argsort(-counts, kind='stable')
+    sorted_group_df = pd.concat([member_sorted_dfs[member].head(counts[member]) for member in order], ignore_index=True)
     return sorted_group_df
 
-# Get SVD Results for 3 users
-def getGroupSVDResults_3Users(df_SVD_Result_1, df_SVD_Result_2, df_SVD_Result_3, expertUserCheck):
-    # Rename SVDRatings column
-    df_SVD_Result_1 = df_SVD_Result_1.rename(columns={'SVDRatings': 'SVDRatings_1'})
-    df_SVD_Result_2 = df_SVD_Result_2.rename(columns={'SVDRatings': 'SVDRatings_2'})
-    df_SVD_Result_3 = df_SVD_Result_3.rename(columns={'SVDRatings': 'SVDRatings_3'})
-    # add SVDRatings_2 and SVDRatings_3 to df_SVD_Result_1
-    df_SVD_Result_1['SVDRatings_2'] = df_SVD_Result_2['SVDRatings_2']
-    df_SVD_Result_1['SVDRatings_3'] = df_SVD_Result_3['SVDRatings_3']
-
-    # copy df_SVD_Result_1 as df_SVD_Result_Group
-    df_SVD_Result_Group = df_SVD_Result_1.copy()
-
-    # calculate Group SVDRatings
-    if expertUserCheck == "no expert" or expertUserCheck == None:
-        # create a new column SVDRatings_Group to store the average of SVDRatings_1, SVDRatings_2, SVDRatings_3
-        df_SVD_Result_Group['SVDRatings_Group'] = df_SVD_Result_Group[['SVDRatings_1', 'SVDRatings_2', 'SVDRatings_3']].mean(axis=1)
-        
-    elif expertUserCheck == "user1":
-        # create a new column SVDRatings_Group that is 40% of SVDRatings_1 column and 30% of SVDRatings_2 and SVDRatings_3 column
-        df_SVD_Result_Group['SVDRatings_Group'] = (df_SVD_Result_Group['SVDRatings_1'] * 0.4) + (df_SVD_Result_Group['SVDRatings_2'] * 0.3) + (df_SVD_Result_Group['SVDRatings_3'] * 0.3)
-    
-    elif expertUserCheck == "user2":
-        # create a new column SVDRatings_Group that is 40% of SVDRatings_2 column and 30% of SVDRatings_1 and SVDRatings_3 column
-        df_SVD_Result_Group['SVDRatings_Group'] = (df_SVD_Result_Group['SVDRatings_2'] * 0.4) + (df_SVD_Result_Group['SVDRatings_1'] * 0.3) + (df_SVD_Result_Group['SVDRatings_3'] * 0.3)
-    
-    elif expertUserCheck == "user3":
-        # create a new column SVDRatings_Group that is 40% of SVDRatings_3 column and 30% of SVDRatings_1 and SVDRatings_2 column
-        df_SVD_Result_Group['SVDRatings_Group'] = (df_SVD_Result_Group['SVDRatings_3'] * 0.4) + (df_SVD_Result_Group['SVDRatings_1'] * 0.3) + (df_SVD_Result_Group['SVDRatings_2'] * 0.3)
-
-
-    # rearrange df_SVD_Result_Group columns based on SVDRatings_Group
-    df_SVD_Result_Group = df_SVD_Result_Group.sort_values(by=['SVDRatings_Group'], ascending=False)
-    return df_SVD_Result_Group
-
-
-# Get sorted group letterboxd df for 3 users
-def get_sorted_3group_letterboxd_df(sorted_df_letterboxd_1, sorted_df_letterboxd_2, sorted_df_letterboxd_3, expertUserCheck):
-    if expertUserCheck == "no expert" or expertUserCheck == None:
-        # get top 5 of all dfs
-        sorted_group_df = pd.concat([sorted_df_letterboxd_1.head(5), sorted_df_letterboxd_2.head(5)], ignore_index=True)
-        sorted_group_df = pd.concat([sorted_group_df, sorted_df_letterboxd_3.head(5)], ignore_index=True)
-    elif expertUserCheck == "user1":
-        # get top 7 for expert, top 4 for non-expert of both dfs
-        sorted_group_df = sorted_df_letterboxd_1.head(7).append(sorted_df_letterboxd_2.head(4), ignore_index=True)
-        sorted_group_df = pd.concat([sorted_group_df, sorted_df_letterboxd_3.head(4)], ignore_index=True)
-    elif expertUserCheck == "user2":
-        # get top 7 for expert, top 4 for non-expert of both dfs
-        sorted_group_df = pd.concat([sorted_df_letterboxd_2.head(7), sorted_df_letterboxd_1.head(4)], ignore_index=True)
-        sorted_group_df = pd.concat([sorted_group_df, sorted_df_letterboxd_3.head(4)], ignore_index=True)
-    elif expertUserCheck == "user3":
-        # get top 7 for expert, top 4 for non-expert of both dfs
-        sorted_group_df = pd.concat([sorted_df_letterboxd_3.head(7), sorted_df_letterboxd_1.head(4)], ignore_index=True)
-        sorted_group_df = pd.concat([sorted_group_df, sorted_df_letterboxd_2.head(4)], ignore_index=True)
-    return sorted_group_df
-
-# Get top 5 genres of movies in df_user_letterboxd (for 3 users)
-def get_group3_top_genres(df_letterboxd_1, df_letterboxd_2, df_letterboxd_3):
-    # combine all sorted dfs
-    df_group_letterboxd = pd.concat([df_letterboxd_1, df_letterboxd_2], ignore_index=True)
-    df_group_letterboxd = pd.concat([df_group_letterboxd, df_letterboxd_3], ignore_index=True)
-    genres = []
-    for index, row in df_group_letterboxd.iterrows():
-        if row['genres'] != '':
-            list_of_genres = row['genres'].split(",")
-            for genre in list_of_genres:
-                genres.append(genre)
-    genres = ' '.join(genres) # convert list of lists to list of strings
-    genres = genres.split(" ")
-    genres = nltk.FreqDist(genres)
-    top_genres = genres.most_common(5)
-    top_genres = [genre[0] for genre in top_genres]
-    return top_genres
-
-# Function to get CBF input
-def get_3Group_filtered_CBF_input(df_svd_results, sorted_df1, sorted_df2, sorted_df3, top_genres):
-    # Sort df_svd_results according to SVDRatings
-    df_svd_results = df_svd_results.sort_values(by=['SVDRatings_Group','popularity','vote_average','vote_count'], ascending = [False, False, False, False])
-    # Drop rows of movies that do not belong in top_genres
-    df_svd_results = df_svd_results[df_svd_results['genres'].str.contains('|'.join(top_genres))]
-    # Drop rows of movies with vote_count < 50
-    df_svd_results = df_svd_results[df_svd_results['vote_count'] > 50]
-    # Drop rows of movies with same imdb_id values in df_user_letterboxd
-    df_svd_results = df_svd_results[~df_svd_results['imdb_id'].isin(sorted_df1['IMDb_ID'])]
-    df_svd_results = df_svd_results[~df_svd_results['imdb_id'].isin(sorted_df2['IMDb_ID'])]
-    df_svd_results = df_svd_results[~df_svd_results['imdb_id'].isin(sorted_df3['IMDb_ID'])]
-    # Return top 1000 movies in df_svd_results
-    df_svd_results = df_svd_results.head(250)
-    return df_svd_results
-
 # Function to get cosine similarity of movies in df_movies
-def get_group_CBF_cosine_sim(df_movies, sorted_df):
-    cosine_sim = []
-    # loop through df_movies['CBF_description'] 
-    # and get cosine similarity of each movie with all movies in sorted_df['CBF_description']
-    for index_df_movies, row_df_movies in df_movies.iterrows():
-        cosine_score = 0
-        for index_sorted_df, row_sorted_df in sorted_df.iterrows():
-            vectorizer = TfidfVectorizer(analyzer='word', min_df=0, stop_words='english')
-            tfidf_matrix = vectorizer.fit_transform([row_df_movies['CBF_description'], row_sorted_df['CBF_description']])
-            cosine_score += cosine_similarity(tfidf_matrix[0], tfidf_matrix[1])[0][0]
-        cosine_sim.append(cosine_score)
-    df_movies['cosine_sim'] = cosine_sim
+def get_group_CBF_cosine_sim(df_movies, sorted_df, catalog_tfidf):
+    # get cosine similarity of each movie with all movies in sorted_df['CBF_description']
+    df_movies['cosine_sim'] = get_CBF_scores(df_movies, sorted_df, catalog_tfidf)
     # Sort df_movies according to weightage of 20% SVDRatings and 80% cosine_sim
     df_movies['finalRatings'] = (df_movies['cosine_sim'] * 30) + df_movies['SVDRatings_Group']
     # print max and min cosine_sim
@@ -0,0 +1,57 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connections kept alive per host, sized to the largest thread pool sending requests
+HTTP_POOL_SIZE = 32
+# Default (connect, read) timeout in seconds
+HTTP_TIMEOUT = (5, 30)
+# Set WATCHLIST_HTTP2=1 to send requests over HTTP/2 (requires httpx[http2])
+USE_HTTP2 = os.environ.get("WATCHLIST_HTTP2") == "1"
+
+session = None
+session_lock = threading.Lock()
+session_is_httpx = False
+
+
+# Function to create HTTP session shared by all Letterboxd and TMDb requests
+def create_session():
+    global session_is_httpx
+    if USE_HTTP2:
+        try:
+            import httpx
+            limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+            # raises ImportError when h2 is not installed
+            client = httpx.Client(http2=True, limits=limits, follow_redirects=True)
+            session_is_httpx = True
+            return client
+        except ImportError:
+            print("httpx[http2] is not installed, using HTTP/1.1")
+
+    http_session = requests.Session()
+    # retry connection errors and rate limited or failed responses
+    retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET"], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries)
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    return http_session
+
+# Function to get HTTP session (created once per process)
+def get_session():
+    global session
+    if session is None:
+        with session_lock:
+            if session is None:
+                session = create_session()
+    return session
+
+# Function to send GET request through the shared HTTP session
+def http_get(url, headers=None, timeout=HTTP_TIMEOUT):
+    http_session = get_session()
+    if session_is_httpx:
+        import httpx
+        timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+    return http_session.get(url, headers=headers, timeout=timeout)
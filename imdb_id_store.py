@@ -0,0 +1,43 @@
+import os
+import sqlite3
+
+# SQLite file storing IMDb IDs of Letterboxd film links (shared by all sessions)
+STORE_FILE = "cache/letterboxd_imdb.sqlite3"
+# Maximum number of links per query (SQLite variable limit)
+QUERY_CHUNK_SIZE = 500
+
+
+# Function to open connection to IMDb ID store
+def get_connection():
+    os.makedirs(os.path.dirname(STORE_FILE), exist_ok=True)
+    conn = sqlite3.connect(STORE_FILE, timeout=30)
+    # WAL lets sessions read while another session is writing
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS letterboxd_imdb (letterboxd_link TEXT PRIMARY KEY, imdb_id TEXT NOT NULL)")
+    return conn
+
+# Function to get stored IMDb IDs of Letterboxd links as dict of letterboxd_link: imdb_id
+def get_stored_imdb_ids(letterboxd_links):
+    letterboxd_links = list(set(letterboxd_links))
+    stored_ids = {}
+    conn = get_connection()
+    try:
+        for i in range(0, len(letterboxd_links), QUERY_CHUNK_SIZE):
+            chunk = letterboxd_links[i:i + QUERY_CHUNK_SIZE]
+            query = "SELECT letterboxd_link, imdb_id FROM letterboxd_imdb WHERE letterboxd_link IN ({0})".format(",".join("?" * len(chunk)))
+            for letterboxd_link, imdb_id in conn.execute(query, chunk):
+                stored_ids[letterboxd_link] = imdb_id
+    finally:
+        conn.close()
+    return stored_ids
+
+# Function to store IMDb IDs with list of (imdb_id, letterboxd_link) tuples
+def store_imdb_ids(imdb_ids):
+    if len(imdb_ids) == 0:
+        return
+    conn = get_connection()
+    try:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO letterboxd_imdb (imdb_id, letterboxd_link) VALUES (?, ?)", imdb_ids)
+    finally:
+        conn.close()
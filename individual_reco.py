@@ -1,32 +1,42 @@
 import pandas as pd
+import json
+import numpy as np
 import streamlit as st
-import os
 import pymongo
-from surprise import Dataset, Reader, dump
+import re
+from surprise import Dataset, Reader
 from surprise.prediction_algorithms.matrix_factorization import SVD
-import requests
+from letterboxd_processing import getTitleDetailsTMDb
 
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import nltk
 nltk.download('stopwords')
 from nltk.corpus import stopwords
-headers = {
-     "accept": "application/json",
-     "Authorization": "Bearer " + st.secrets['tmdb_key']
-}
+from genres import get_genre_pattern_mask
 pymongo_user = st.secrets['pymongo_user']
 
 
 client = pymongo.MongoClient(pymongo_user)
 db = client.TheMovieDatabase
-
-
-# Function to get dataframe of DB from PyMongo Collection
-def getPyMongoDB(requestedCollection):
+# Number of documents fetched per round-trip from PyMongo
+MONGO_BATCH_SIZE = 5000
+
+
+# Function to get PyMongo projection of the needed columns (None gets every column)
+def buildPyMongoProjection(columns=None):
+    if columns is None:
+        return None
+    projection = {column: 1 for column in columns}
+    if '_id' not in columns:
+        projection['_id'] = 0
+    return projection
+
+# Function to get dataframe of DB from PyMongo Collection with only the needed columns
+# (year, rating and genre filters are applied to the catalog snapshot, see preprocessing)
+def getPyMongoDBFiltered(requestedCollection, columns=None):
     db_collection = db[requestedCollection]
-    collection = db_collection.find()
-    df_collection = pd.DataFrame(list(collection))
+    collection = db_collection.find({}, buildPyMongoProjection(columns)).batch_size(MONGO_BATCH_SIZE)
+    df_collection = pd.DataFrame(list(collection), columns=columns)
     return df_collection
 
 
@@ -37,36 +47,28 @@ def getAverageRating(df_user):
     average_rating = df_user['rating'].mean()
     return average_rating
 
+# Function to get index of movie id by imdb id
+def getImdbIndex(df_movies):
+    df_index = df_movies.drop_duplicates(subset=['imdb_id'])
+    return pd.Series(df_index['id'].values, index=df_index['imdb_id'].values)
+
 # Function to Return Dataframe used for SVD 
-def getUserRatingSVDDF(df_user_initial, df_movies_db, username):
+def getUserRatingSVDDF(df_user_initial, df_movies_db, username, imdb_index=None):
     # The function eliminates all ratings that are not found in the database
-    df_user_initial["userId"] = username
-    df_user_initial["movieId"] = ""
-    for index, row in df_user_initial.iterrows():
-        # Find the matching row in all_movies by imdb_id
-        matching_row = df_movies_db[df_movies_db["imdb_id"] == row["IMDb_ID"]]
-        if len(matching_row)> 0:
-            df_user_initial.at[index, "movieId"] = matching_row["id"].values[0]
-
-    df_user_SVD = df_user_initial[df_user_initial["movieId"] != ""]
+    if imdb_index is None:
+        imdb_index = getImdbIndex(df_movies_db)
+    # Find the matching movie id by imdb_id, keeping movies in df_movies_db only
+    movie_ids = df_user_initial["IMDb_ID"].map(imdb_index)
+    # new columns are added to a copy, the profile is shared with stages running at the same time
+    df_user_initial = df_user_initial.assign(userId=username, movieId=movie_ids.where(movie_ids.isin(df_movies_db["id"])))
+
+    df_user_SVD = df_user_initial[df_user_initial["movieId"].notna()].copy()
+    df_user_SVD["movieId"] = df_user_SVD["movieId"].astype('int64')
     # Drop the specified columns
     columns_to_drop = ['letterboxd_id', 'liked', 'letterboxd_link', 'title','IMDb_ID']
     df_user_SVD = df_user_SVD.drop(columns=columns_to_drop) 
     return df_user_SVD
 
-# Function to combine user rating and ratings dataset
-def combineRatingsDF(df_ratings):
-    # get columns userId, movieId, rating only for df_user_1_SVD
-    df_ratings = df_ratings[['userId','movieId','rating']]
-    df_ratings.reset_index(inplace=True, drop=True) # Reset Index
-    # Get ratings dataset from PyMongo
-    df_small_ratingsDB = getPyMongoDB("ratings_small")
-    # drop _id and timestamp column of df_small_ratingsDB
-    df_small_ratingsDB = df_small_ratingsDB.drop(columns=['_id', 'timestamp'])
-    # Combine both user ratings and ratings dataset
-    df_ratings_combined = pd.concat([df_ratings, df_small_ratingsDB], ignore_index=True)
-    return df_ratings_combined
-
 # Function to train SVD Model
 def trainSVDModel(df_ratings):
     # Initialize a surprise reader object
@@ -80,102 +82,117 @@ def trainSVDModel(df_ratings):
     svd.fit(trainset)
     return svd
 
-# Function to load SVD Model
-def loadSVDModel(model_filename):
-    file_name = os.path.expanduser(model_filename)
-    _, loaded_model = dump.load(file_name)
-    return loaded_model
-
-# Function to Get SVD Recommendation
-def getSVDRecommendations(data, df_movies, user_id, algo):
-    # creating an empty list to store the recommended movie ids
-    recommendations = []
-    
-    # creating an user item interactions matrix 
-    user_movie_interactions_matrix = data.pivot(index='userId', columns='movieId', values='rating')
-   
-    # extracting those product ids which the user_id has not interacted yet
-    non_interacted_movies = user_movie_interactions_matrix.loc[user_id][user_movie_interactions_matrix.loc[user_id].isnull()].index.tolist()
-    
-    # looping through each of the product ids which user_id has not interacted yet
-    for item_id in non_interacted_movies:
-        
-        # predicting the ratings for those non interacted product ids by this user
-        est = algo.predict(user_id, item_id).est
-        
-        # appending the predicted ratings
-        recommendations.append((est, item_id))
-        
-    # sorting the predicted ratings in descending order
-    recommendations.sort(key=lambda x: x[1], reverse=True)
-
-    return recommendations # returning sorted list
-
-
+# Function to get factors, biases and id map of trained SVD model as dict (used by model_registry)
+def getModelFromSVD(algo):
+    trainset = algo.trainset
+    # raw movie id of each inner id
+    raw_to_inner = trainset._raw2inner_id_items
+    item_ids = np.empty(trainset.n_items, dtype=np.int64)
+    item_ids[np.fromiter(raw_to_inner.values(), dtype=np.int64)] = np.fromiter(raw_to_inner.keys(), dtype=np.int64)
+    return {
+        'version': None,
+        'global_mean': trainset.global_mean,
+        'bi': algo.bi,
+        'qi': algo.qi,
+        'item_ids': item_ids,
+        'item_index': pd.Index(item_ids),
+        'reg_bu': algo.reg_bu,
+        'reg_pu': algo.reg_pu,
+        'rating_scale': trainset.rating_scale,
+    }
+
+# Function to get inner ids of movies in model (-1 for movies not in the ratings dataset)
+def getInnerItemIds(model, movie_ids):
+    # item_index holds the raw movie id of each inner id, so its positions are the inner ids
+    return model['item_index'].get_indexer(np.asarray(movie_ids)).astype(np.int64)
+
+# Function to fold a new user into a trained model
+# Solves the user bias and factors by regularised least squares against the fixed item biases and factors
+def foldInUser(model, df_user):
+    qi = model['qi']
+    n_factors = qi.shape[1]
+    inner_ids = getInnerItemIds(model, df_user['movieId'])
+    known = inner_ids >= 0
+    inner_ids = inner_ids[known]
+    ratings = df_user['rating'].values[known].astype(float)
+    if len(inner_ids) == 0:
+        return 0.0, np.zeros(n_factors)
+
+    # r - mu - b_i = b_u + q_i . p_u
+    design = np.hstack([np.ones((len(inner_ids), 1)), qi[inner_ids]])
+    target = ratings - model['global_mean'] - model['bi'][inner_ids]
+    # SGD applies the regularisation once per rating, so scale it by the number of ratings
+    regularisation = np.full(n_factors + 1, model['reg_pu'] * len(inner_ids))
+    regularisation[0] = model['reg_bu'] * len(inner_ids)
+    solution = np.linalg.solve(design.T @ design + np.diag(regularisation), design.T @ target)
+    return solution[0], solution[1:]
+
+# Function to predict ratings of all unrated items for one user as one matrix-vector product
+# Returns raw movie ids and predicted ratings of items not in rated_inner_ids
+def predictAllItems(model, user_bias, user_factors, rated_inner_ids):
+    low, high = model['rating_scale']
+    # mu + b_u + b_i + q_i . p_u for all items, clipped to rating scale as in algo.predict
+    est = model['global_mean'] + user_bias + model['bi'] + model['qi'] @ user_factors
+    est = np.clip(est, low, high)
+    # mask rated items
+    unrated = np.ones(len(est), dtype=bool)
+    unrated[rated_inner_ids] = False
+    return model['item_ids'][unrated], est[unrated]
+
+# Function to convert predicted ratings to list of (est, movie id) sorted by movie id in descending order
+def getSortedRecommendations(item_ids, est):
+    order = np.argsort(item_ids, kind='stable')[::-1]
+    return list(zip(est[order], item_ids[order]))
+
+# Function to Get SVD Recommendation of user folded into the model
+def getFoldInRecommendations(model, df_user, user_bias, user_factors):
+    rated_inner_ids = getInnerItemIds(model, df_user['movieId'])
+    rated_inner_ids = rated_inner_ids[rated_inner_ids >= 0]
+    item_ids, est = predictAllItems(model, user_bias, user_factors, rated_inner_ids)
+    return getSortedRecommendations(item_ids, est)
 
 # Get SVD Results as Dataframe
 def get_SVD_Dataframe(sorted_recommendations, df_movies, user_id, avgRating):
     df_with_SVD_ratings = df_movies.copy()
-    # To store the predicted ratings for each movie
-    predicted_ratings = {}
-    
-    for movie_info in sorted_recommendations:
-        movie_id = movie_info[1]  # Extract movie id 
-        rating = movie_info[0]  # Extract predicted SVD rating 
-        
-        # Add the predicted rating to the dictionary
-        predicted_ratings[movie_id] = rating
-    
-    # Create a list to store the predicted ratings for all movies in the dataframe
-    ratings = []
-    
-    # Iterate through all movies in the dataframe
-    for index, row in df_with_SVD_ratings.iterrows():
-        movie_id = row['id']
-        
-        # Check if the movie has a predicted rating in the dictionary
-        if movie_id in predicted_ratings:
-            # If there is a match, append the predicted rating
-            ratings.append(predicted_ratings[movie_id])
-        else:
-            # If there is no match, append the average rating
-            ratings.append(avgRating)
-    
-    # Add the SVD predicted ratings as a new column to the dataframe
-    df_with_SVD_ratings['SVDRatings'] = ratings
+    # Predicted SVD rating by movie id
+    predicted_ratings = pd.DataFrame(sorted_recommendations, columns=['SVDRatings', 'id'])
+    predicted_ratings = predicted_ratings.drop_duplicates(subset=['id'], keep='last').set_index('id')['SVDRatings']
+
+    # Add the SVD predicted ratings as a new column to the dataframe,
+    # movies with no predicted rating get the average rating of the user
+    df_with_SVD_ratings['SVDRatings'] = df_with_SVD_ratings['id'].map(predicted_ratings).fillna(avgRating)
     # Sort df_with_SVD_ratings according to SVDRatings
     df_with_SVD_ratings = df_with_SVD_ratings.sort_values(by=['SVDRatings'], ascending = False)
     return df_with_SVD_ratings
 
 #====================================== CONTENT-BASED FILTERING ======================================
-def getMovieKeyword(id):
-    url = "https://api.themoviedb.org/3/movie/" + str(id) + "/keywords"
-    response = requests.get(url, headers=headers)
-    keywords_json = response.json()
+# Function to join TMDB API keyword names into keyword string
+def get_keyword_string(keywords):
     keyword_string = ""
-    # check if keywords_json is not empty 
-    if keywords_json['keywords']:
-        # get keywords name from keywords_json
-        for kw in keywords_json['keywords']:
-            keyword_string += kw['name'] + " "    
+    for kw in keywords:
+        keyword_string += kw['name'] + " "
     return keyword_string
 
-def getTVKeyword(id):
-    url = "https://api.themoviedb.org/3/tv/" + str(id) + "/keywords"
-    response = requests.get(url, headers=headers)
-    keywords_json = response.json()
-    keyword_string = ""
-    # check if keywords_json is empty
-    if keywords_json['results']:
-        # get keywords name from keywords_json
-        for kw in keywords_json['results']:
-            keyword_string += kw['name'] + " "
-    return keyword_string
+# Function to get keyword string from TMDB details response with appended keywords
+# (movie keywords are listed in 'keywords', tv keywords in 'results')
+def get_details_keyword_string(details_json):
+    keywords = details_json.get('keywords', {})
+    return get_keyword_string(keywords.get('keywords', keywords.get('results', [])))
+
+# Function to get keywords of movie or TV title ("movie" or "TV") from its TMDB details,
+# the same cached request that resolves Netflix titles
+def getTitleKeyword(media, id):
+    response = getTitleDetailsTMDb("tv" if media == "TV" else "movie", id)
+    return get_details_keyword_string(json.loads(response))
 
-# function to get keywords using TMDB API for sorted df
+# function to get keywords using TMDB API for sorted df,
+# titles that already have keywords (from the catalog or fetched with their TMDB details) are not requested again
 def get_keywords(sorted_df):
-    # for rows where media = 'movie', apply getMovieKeyword
-    sorted_df['keywords'] = sorted_df.apply(lambda row: getMovieKeyword(row['tmdb_id']) if row['media'] == 'movie' else getTVKeyword(row['tmdb_id']), axis=1)
+    if 'keywords' not in sorted_df.columns:
+        sorted_df['keywords'] = None
+    missing = sorted_df['keywords'].isna()
+    if missing.any():
+        sorted_df.loc[missing, 'keywords'] = sorted_df[missing].apply(lambda row: getTitleKeyword(row['media'], row['tmdb_id']), axis=1)
     return sorted_df
 
 # Function to sort df according to ratings and liked
@@ -188,29 +205,35 @@ def sort_rated_df(df_user):
     return sorted_df
 
 
-# Function to get overall description of movies in movie database
-def get_CBF_description(df_movies):
+# Stopwords and patterns used to clean CBF descriptions
+STOP_WORDS = frozenset(stopwords.words('english'))
+ID_NAME_PATTERN = re.compile(r'id|name')
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+SPACE_PATTERN = re.compile(r'\s+')
+NUMBER_PATTERN = re.compile(r'\d+')
+
+# Function to clean text of CBF description
+def clean_CBF_text(text):
+    # Remove stopwords
+    text = ' '.join([word for word in text.split() if word not in STOP_WORDS])
+    text = PUNCTUATION_PATTERN.sub('', text) # remove punctuation
+    text = SPACE_PATTERN.sub(' ', text) # remove extra spaces
+    text = NUMBER_PATTERN.sub('', text) # remove numbers
+    return text.lower() # convert lowercase
+
+# Function to add overall description of movies in movie database (run once when building the catalog)
+def add_CBF_description(df_movies):
     # Combine all relevant columns into one
     # fill NaN with empty string
-    df_movies['overview'] = df_movies['overview'].fillna('') 
-    df_movies['tagline'] = df_movies['tagline'].fillna('') 
-    df_movies['genres'] = df_movies['genres'].fillna('') 
-    df_movies['keywords'] = df_movies['keywords'].fillna('')
-
-    df_movies['CBF_description'] = df_movies['overview'] + df_movies['tagline'] +df_movies['genres'] + df_movies['keywords']
-    df_movies['CBF_description'] = df_movies['CBF_description'].fillna('')
-    # remove words "id" and "name"
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.replace(r'id', '')
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.replace(r'name', '')
-    
-    # Clean the data
-    stop_words = stopwords.words('english') # Remove stopwords
-    df_movies['CBF_description'] = df_movies['CBF_description'].apply(lambda x: ' '.join([word for word in x.split() if word not in (stop_words)]))
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.replace(r'[^\w\s]', '') # remove punctuation
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.replace(r'\s+', ' ') # remove extra spaces
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.replace(r'\d+', '') # remove numbers
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.lower() # convert lowercase
+    df_movies['CBF_description'] = df_movies['overview'].fillna('') + df_movies['tagline'].fillna('') + \
+        df_movies['genres'].fillna('') + df_movies['keywords'].fillna('')
+    # remove words "id" and "name" and clean the data
+    df_movies['CBF_description'] = df_movies['CBF_description'].apply(lambda x: clean_CBF_text(ID_NAME_PATTERN.sub('', x)))
+    return df_movies
 
+# Function to get movies in movie database with overall description
+def get_CBF_description(df_movies):
+    # CBF_description is built once with the catalog snapshot
     # Drop rows with CBF_description = ''
     df_movies = df_movies[df_movies['CBF_description'] != '']
     return df_movies
@@ -221,19 +244,13 @@ def get_CBF_description_letterboxd(df_movies):
     df_movies['overview'] = df_movies['overview'].fillna('') 
     df_movies['genres'] = df_movies['genres'].fillna('') 
     # remove words "id" and "name" from genres
-    df_movies['genres'] = df_movies['genres'].str.replace(r'id', '')
-    df_movies['genres'] = df_movies['genres'].str.replace(r'name', '')
+    df_movies['genres'] = df_movies['genres'].apply(lambda x: ID_NAME_PATTERN.sub('', x))
 
     df_movies['CBF_description'] = df_movies['overview'] + df_movies['genres'] + df_movies['keywords']
     df_movies['CBF_description'] = df_movies['CBF_description'].fillna('')
     
     # Clean the data
-    stop_words = stopwords.words('english') # Remove stopwords
-    df_movies['CBF_description'] = df_movies['CBF_description'].apply(lambda x: ' '.join([word for word in x.split() if word not in (stop_words)]))
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.replace(r'[^\w\s]', '') # remove punctuation
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.replace(r'\s+', ' ') # remove extra spaces
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.replace(r'\d+', '') # remove numbers
-    df_movies['CBF_description'] = df_movies['CBF_description'].str.lower() # convert lowercase
+    df_movies['CBF_description'] = df_movies['CBF_description'].apply(clean_CBF_text)
 
     # Drop rows with CBF_description = ''
     df_movies = df_movies[df_movies['CBF_description'] != '']
@@ -255,31 +272,39 @@ def get_top_genres(df_user_letterboxd):
     return top_genres
 
 # Function to get CBF input
-def get_filtered_CBF_input(df_svd_results, sorted_df, top_genres):
+def get_filtered_CBF_input(df_svd_results, sorted_df, top_genres, limit=200):
     # Sort df_svd_results according to SVDRatings
     df_svd_results = df_svd_results.sort_values(by=['SVDRatings','popularity','vote_average','vote_count'], ascending = [False, False, False, False])
-    df_svd_results = df_svd_results[df_svd_results['genres'].str.contains('|'.join(top_genres))]
+    df_svd_results = df_svd_results[(df_svd_results['genre_mask'] & get_genre_pattern_mask(top_genres)) != 0]
     # Drop rows of movies with vote_count < 50
     df_svd_results = df_svd_results[df_svd_results['vote_count'] > 50]
     # Drop rows of movies with same imdb_id values in df_user_letterboxd
     df_svd_results = df_svd_results[~df_svd_results['imdb_id'].isin(sorted_df['IMDb_ID'])]
-    # Return top 1000 movies in df_svd_results
-    df_svd_results = df_svd_results.head(200)
+    # Return top movies in df_svd_results (limit=None keeps every candidate)
+    if limit is not None:
+        df_svd_results = df_svd_results.head(limit)
     return df_svd_results
 
+# Function to fit TF-IDF model over CBF descriptions of all movies in the catalog
+def fit_CBF_tfidf(descriptions):
+    vectorizer = TfidfVectorizer(analyzer='word', stop_words='english')
+    tfidf_matrix = vectorizer.fit_transform(descriptions)
+    return vectorizer, tfidf_matrix
+
+# Function to get sum of cosine similarity of each movie in df_movies with all movies in sorted_df
+def get_CBF_scores(df_movies, sorted_df, catalog_tfidf):
+    vectorizer, tfidf_matrix = catalog_tfidf
+    # catalog_row is the row of the movie in the catalog TF-IDF matrix
+    movies_tfidf = tfidf_matrix[df_movies['catalog_row'].values]
+    sorted_tfidf = vectorizer.transform(sorted_df['CBF_description'])
+    # TF-IDF rows are L2-normalised so the dot product is the cosine similarity
+    cosine_sim = movies_tfidf @ sorted_tfidf.T
+    return np.asarray(cosine_sim.sum(axis=1)).ravel()
+
 # Function to get cosine similarity of movies in df_movies
-def get_CBF_cosine_sim(df_movies, sorted_df):
-    cosine_sim = []
-    # loop through df_movies['CBF_description'] 
-    # and get cosine similarity of each movie with all movies in sorted_df['CBF_description']
-    for index_df_movies, row_df_movies in df_movies.iterrows():
-        cosine_score = 0
-        for index_sorted_df, row_sorted_df in sorted_df.iterrows():
-            vectorizer = TfidfVectorizer(analyzer='word', min_df=0, stop_words='english')
-            tfidf_matrix = vectorizer.fit_transform([row_df_movies['CBF_description'], row_sorted_df['CBF_description']])
-            cosine_score += cosine_similarity(tfidf_matrix[0], tfidf_matrix[1])[0][0]
-        cosine_sim.append(cosine_score)
-    df_movies['cosine_sim'] = cosine_sim
+def get_CBF_cosine_sim(df_movies, sorted_df, catalog_tfidf):
+    # get cosine similarity of each movie with all movies in sorted_df['CBF_description']
+    df_movies['cosine_sim'] = get_CBF_scores(df_movies, sorted_df, catalog_tfidf)
     # Sort df_movies according to weightage of 20% SVDRatings and 80% cosine_sim
     df_movies['finalRatings'] = (df_movies['cosine_sim'] * 30) + df_movies['SVDRatings']
     # print max and min cosine_sim
@@ -1,13 +1,21 @@
 from bs4 import BeautifulSoup
 import streamlit as st
-import requests
+from http_client import http_get, HTTP_POOL_SIZE
+from tmdb_cache import tmdb_get, TMDB_API_URL
 import pandas as pd
 import concurrent.futures
 import json
+import os
 import re
 
+from imdb_id_store import get_stored_imdb_ids, store_imdb_ids
+
 
 LETTERBOXD_DOMAIN = "https://letterboxd.com"
+# Maximum number of Letterboxd pages fetched at the same time
+LETTERBOXD_MAX_WORKERS = 8
+# TMDb genre lists used when the TMDb genre endpoints cannot be reached
+GENRE_FALLBACK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tmdb_genres.json")
 headers = {
      "accept": "application/json",
      "Authorization": "Bearer " + st.secrets['tmdb_key']
@@ -42,7 +50,7 @@ def transform_ratings(original_rating):
 # Function to Get IMDb ID of Movies or TV Shows with Letterboxd URL
 def get_imdb_id(letterboxd_url):
     respond = {}
-    resp = requests.get(letterboxd_url)
+    resp = http_get(letterboxd_url)
     if resp.status_code != 200:
         respond = ("None", letterboxd_url)
         return respond
@@ -57,21 +65,59 @@ def get_imdb_id(letterboxd_url):
 
 # Function to send concurrent requests to get IMDB ID with df_film as input
 def get_imdb_ids_concurrently(df):
-    imdb_ids = []
     urls = df['letterboxd_link'].tolist()
+    # Get IMDB IDs found in previous requests from the store
+    stored_ids = get_stored_imdb_ids(urls)
+    imdb_ids = [(stored_ids[url], url) for url in urls if url in stored_ids]
+    missing_urls = [url for url in urls if url not in stored_ids]
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        # Submit tasks for each URL
-        futures = [executor.submit(get_imdb_id, url) for url in urls]
+    fetched_ids = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as executor:
+        # Submit tasks for each URL not in the store
+        futures = [executor.submit(get_imdb_id, url) for url in missing_urls]
 
         # Retrieve results as they complete
         for future in concurrent.futures.as_completed(futures):
             imdb_id = future.result()
-            imdb_ids.append(imdb_id)
+            fetched_ids.append(imdb_id)
 
+    # Store IMDB IDs that were found
+    store_imdb_ids([imdb_id for imdb_id in fetched_ids if imdb_id[0] != "None"])
+    imdb_ids.extend(fetched_ids)
     return imdb_ids
 
 
+# Function to add details of film in Letterboxd poster list to movies_dict
+def add_film_details(movie, movies_dict):
+    letterboxd_link = movie.find('div')['data-target-link']
+    movies_dict['letterboxd_id'].append(movie.find('div')['data-film-id'])
+    movies_dict['title'].append(movie.find('img')['alt'])
+    movies_dict['rating'].append(transform_ratings(movie.find('p', {"class": "poster-viewingdata"}).get_text().strip()))
+    movies_dict['liked'].append(movie.find('span', {'class': 'like'})!=None)
+    movies_dict['letterboxd_link'].append(LETTERBOXD_DOMAIN+letterboxd_link)
+
+# Function to add all films in Letterboxd page to movies_dict
+def add_page_films(soup, movies_dict):
+    ul = soup.find("ul", {"class": "poster-list"})
+    if (ul != None):
+        movies = ul.find_all("li")
+        for movie in movies:
+            print("Scraping: "+movie.find('img')['alt'])
+            add_film_details(movie, movies_dict)
+
+# Function to get parsed Letterboxd page (None if the page is not valid)
+def get_films_page(url):
+    url_page = http_get(url)
+    if url_page.status_code != 200:
+        return None
+    return BeautifulSoup(url_page.content, 'lxml')
+
+# Function to get number of pages from pagination of Letterboxd page
+def get_num_pages(li_pagination):
+    # pagination may skip pages ("1 2 3 ... 50"), so use the last page number
+    page_numbers = [int(li.get_text().strip()) for li in li_pagination if li.get_text().strip().isdigit()]
+    return max(page_numbers, default=1)
+
 # Function to Scrape All Watched and Rated Films/TV of user (without IMDb ID)
 def scrape_all_films(username):
     movies_dict = {}
@@ -82,49 +128,28 @@ def scrape_all_films(username):
     movies_dict['letterboxd_link'] = []
 
     url = LETTERBOXD_DOMAIN + "/" + username + "/films/by/entry-rating/"
-    url_page = requests.get(url)
-    soup = BeautifulSoup(url_page.content, 'lxml')
+    soup = get_films_page(url)
     
     # Check if the page is valid
-    if url_page.status_code != 200:
+    if soup is None:
         return pd.DataFrame(movies_dict)
     
     # check number of pages
     li_pagination = soup.findAll("li", {"class": "paginate-page"})
-    if len(li_pagination) == 0:
-        ul = soup.find("ul", {"class": "poster-list"})
-        if (ul != None):
-            movies = ul.find_all("li")
-            for movie in movies:
-                print("Scraping: "+movie.find('img')['alt'])
-                letterboxd_link = movie.find('div')['data-target-link']
-                movies_dict['letterboxd_id'].append(movie.find('div')['data-film-id'])
-                movies_dict['title'].append(movie.find('img')['alt'])
-                movies_dict['rating'].append(transform_ratings(movie.find('p', {"class": "poster-viewingdata"}).get_text().strip()))
-                movies_dict['liked'].append(movie.find('span', {'class': 'like'})!=None)
-                movies_dict['letterboxd_link'].append(LETTERBOXD_DOMAIN+letterboxd_link)
-                
-    else:
-        for i in range(len(li_pagination)):
-            url = LETTERBOXD_DOMAIN + "/" + username + "/films/by/entry-rating/page/" + str(i+1)
-            url_page = requests.get(url)
-            
-            if url_page.status_code != 200:
-                return pd.DataFrame(movies_dict)
-            
-            soup = BeautifulSoup(url_page.content, 'lxml')
-            ul = soup.find("ul", {"class": "poster-list"})
-            if (ul != None):
-                movies = ul.find_all("li")
-                for movie in movies:
-                    print("Scraping: "+movie.find('img')['alt'])
-                    letterboxd_link = movie.find('div')['data-target-link']
-                    movies_dict['letterboxd_id'].append(movie.find('div')['data-film-id'])
-                    movies_dict['title'].append(movie.find('img')['alt'])
-                    movies_dict['rating'].append(transform_ratings(movie.find('p', {"class": "poster-viewingdata"}).get_text().strip()))
-                    movies_dict['liked'].append(movie.find('span', {'class': 'like'})!=None)
-                    movies_dict['letterboxd_link'].append(LETTERBOXD_DOMAIN+letterboxd_link)
-                    
+    num_pages = get_num_pages(li_pagination)
+
+    # first page is reused, remaining pages are fetched concurrently in page order
+    pages = [soup]
+    if num_pages > 1:
+        urls = [url + "page/" + str(i) for i in range(2, num_pages+1)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=LETTERBOXD_MAX_WORKERS) as executor:
+            pages.extend(executor.map(get_films_page, urls))
+
+    for page in pages:
+        # stop at the first page that is not valid
+        if page is None:
+            break
+        add_page_films(page, movies_dict)
     
     df_film = pd.DataFrame(movies_dict)  
     # Drop Films with No Rating
@@ -132,7 +157,8 @@ def scrape_all_films(username):
     return df_film
 
 # Function scrape one page
-def scrape_films_one_page(username):
+# progress_callback(done, total) is called as films are scraped, a progress bar is shown when no callback is given
+def scrape_films_one_page(username, progress_callback=None):
     movies_dict = {}
     movies_dict['letterboxd_id'] = []
     movies_dict['title'] = []
@@ -141,7 +167,7 @@ def scrape_films_one_page(username):
     movies_dict['letterboxd_link'] = []
 
     url = LETTERBOXD_DOMAIN + "/" + username + "/films/by/entry-rating/"
-    url_page = requests.get(url)
+    url_page = http_get(url)
 
     # Check if the page is valid
     if url_page.status_code != 200:
@@ -152,19 +178,18 @@ def scrape_films_one_page(username):
     if (ul != None):
         movies = ul.find_all("li")
         progress = 0
-        bar = st.progress(progress)
+        bar = None
+        if progress_callback is None:
+            bar = st.progress(progress)
+            progress_callback = lambda done, total: bar.progress(done/total)
         for movie in movies:
             progress = progress+1
             print("Scraping movie (one page): "+movie.find('img')['alt'])
             # Get movie details
-            letterboxd_link = movie.find('div')['data-target-link']
-            movies_dict['letterboxd_id'].append(movie.find('div')['data-film-id'])
-            movies_dict['title'].append(movie.find('img')['alt'])
-            movies_dict['rating'].append(transform_ratings(movie.find('p', {"class": "poster-viewingdata"}).get_text().strip()))
-            movies_dict['liked'].append(movie.find('span', {'class': 'like'})!=None)
-            movies_dict['letterboxd_link'].append(LETTERBOXD_DOMAIN+letterboxd_link)
-            bar.progress(progress/len(movies))
-        bar.empty()
+            add_film_details(movie, movies_dict)
+            progress_callback(progress, len(movies))
+        if bar is not None:
+            bar.empty()
     df_film = pd.DataFrame(movies_dict)  
     # Drop Films with No Rating
     df_film = df_film[df_film['rating']!=-1].reset_index(drop=True) 
@@ -183,129 +208,162 @@ def scrape_films_one_page(username):
 # Function to get Film Details using TMDb API
 def getFilmDetailsTMDb(imdbId):
     # Get URL Prompt to access TMDb API
-    film_details_TMDb_url = "https://api.themoviedb.org/3/find/" + imdbId + "?external_source=imdb_id"
+    film_details_TMDb_url = TMDB_API_URL + "/find/" + imdbId + "?external_source=imdb_id"
     
     # Get response from TMDb API
-    response = requests.get(film_details_TMDb_url, headers=headers)
-    return response.text
+    response = tmdb_get(film_details_TMDb_url, headers=headers)
+    return response
+
+# Function to get details of movie or TV title ("movie" or "tv") with TMDb ID,
+# keywords and external ids (IMDb ID) are returned in the same response
+def getTitleDetailsTMDb(media, tmdbId):
+    title_details_TMDb_url = TMDB_API_URL + "/" + media + "/" + str(tmdbId) + "?append_to_response=keywords,external_ids"
+    response = tmdb_get(title_details_TMDb_url, headers=headers)
+    return response
 
 # Function to Get Movie Genre List
 def getMovieGenreList():
-    movie_genre_list_url = "https://api.themoviedb.org/3/genre/movie/list"
-    response = requests.get(movie_genre_list_url, headers=headers)
-    return response.text
+    movie_genre_list_url = TMDB_API_URL + "/genre/movie/list"
+    response = tmdb_get(movie_genre_list_url, headers=headers)
+    return response
 
 # Function to Get TV Genre List
 def getTVGenreList():
-    tv_genre_list_url = "https://api.themoviedb.org/3/genre/tv/list" 
-    response = requests.get(tv_genre_list_url, headers=headers)
-    return response.text
-
-# Function to Get Genre Name Using ID
-def getGenresFromID(jsonGenreList, genre_ids_list):
-    # Create List for Genre Names
-    genres = ""
-    genreList = json.loads(jsonGenreList)
-    genreList = genreList["genres"]
-    
-    #Find Genre names by IDs
-    for id in genre_ids_list:
-        for genre in genreList:
-            if genre["id"] == id:
-                genres = genres + genre["name"] +"," 
-    return genres[:-1] # remove last comma
+    tv_genre_list_url = TMDB_API_URL + "/genre/tv/list" 
+    response = tmdb_get(tv_genre_list_url, headers=headers)
+    return response
 
+# Function to get genre lookup of media ("movie" or "tv") as dict of genre id: genre name
+# (loaded once per process, falls back to bundled genre list when TMDb cannot be reached)
+@st.cache_resource(show_spinner=False)
+def getGenreLookup(media):
+    try:
+        response = getMovieGenreList() if media == "movie" else getTVGenreList()
+        genreList = json.loads(response)["genres"]
+    except Exception as e:
+        print("Using bundled " + media + " genre list: " + str(e))
+        with open(GENRE_FALLBACK_FILE) as file:
+            genreList = json.load(file)[media]
+    return {genre["id"]: genre["name"] for genre in genreList}
+
+# Function to get comma separated genre names of Series of genre id lists,
+# media is "movie", "TV" or a Series of these aligned with genre_ids
+def getGenresFromIDs(genre_ids, media):
+    if not isinstance(media, pd.Series):
+        media = pd.Series(media, index=genre_ids.index)
+    # one row per (title, genre id)
+    exploded = genre_ids.explode().dropna()
+    exploded_media = media.loc[exploded.index]
+    genre_names = exploded.map(getGenreLookup("movie")).where(exploded_media != "TV", exploded.map(getGenreLookup("tv")))
+    genre_names = genre_names.dropna()
+    genres = genre_names.groupby(level=0, sort=False).agg(",".join)
+    return genres.reindex(genre_ids.index, fill_value="")
+
+
+# Columns added to film df by getFilmMetadataDF (keywords are only known for catalog films,
+# the others are fetched for the top rated films in individual_reco.get_keywords)
+METADATA_COLUMNS = ['adult', 'original_language', 'overview', 'vote_average', 'vote_count', 'popularity',
+                    'release_date', 'genres', 'poster_path', 'media', 'tmdb_id', 'keywords']
+
+# Function to get film metadata from TMDb find response (genres are left as genre_ids and resolved per batch)
+def parseFilmDetails(filmDetail):
+    # For Movies
+    if(len(filmDetail['movie_results'])!=0):
+        result = filmDetail['movie_results'][0]
+        release_date = result['release_date']
+        media = "movie"
+    # For TV
+    elif(len(filmDetail['tv_results'])!=0):
+        result = filmDetail['tv_results'][0]
+        release_date = result['first_air_date'] # For TV (First Release Date)
+        media = "TV"
+    else:
+        filmMetadata = {column: "" for column in METADATA_COLUMNS}
+        filmMetadata['genre_ids'] = []
+        return filmMetadata
+
+    return {
+        'adult': str(result['adult']),
+        'original_language': str(result['original_language']),
+        'overview': str(result['overview'].replace('\n', ' ')),
+        'vote_average': str(result['vote_average']),
+        'vote_count': str(result['vote_count']),
+        'popularity': result['popularity'],
+        'release_date': release_date,
+        'genre_ids': result['genre_ids'],
+        'poster_path': str(result['poster_path']),
+        'media': media,
+        'tmdb_id': result['id'],
+        'keywords': None
+    }
+
+# Function to get film metadata of one film with IMDb ID
+def getFilmMetadata(imdbID):
+    print("Getting details for: " + imdbID)
+    # Call function to get Film Details
+    tmdbResponse = getFilmDetailsTMDb(imdbID)
+    filmDetail = json.loads(tmdbResponse)
+    return parseFilmDetails(filmDetail)
+
+# Function to get film metadata of films found in the catalog as df indexed by IMDb ID,
+# with the same columns and value formats as the TMDb metadata
+def getCatalogMetadataDF(imdb_ids, df_catalog):
+    df_found = df_catalog[df_catalog['imdb_id'].isin(imdb_ids)].drop_duplicates(subset=['imdb_id'])
+    df_metadata = pd.DataFrame(index=df_found['imdb_id'].values)
+    df_metadata['adult'] = df_found['adult'].astype(str).values
+    df_metadata['original_language'] = df_found['original_language'].astype(str).values
+    df_metadata['overview'] = df_found['overview'].fillna('').str.replace('\n', ' ', regex=False).values
+    df_metadata['vote_average'] = df_found['vote_average'].fillna(0).astype(str).values
+    df_metadata['vote_count'] = df_found['vote_count'].fillna(0).astype(int).astype(str).values
+    df_metadata['popularity'] = df_found['popularity'].values
+    df_metadata['release_date'] = pd.to_datetime(df_found['release_date']).dt.strftime('%Y-%m-%d').fillna('').values
+    df_metadata['genres'] = df_found['genres_list'].apply(','.join).values
+    df_metadata['poster_path'] = df_found['poster_path'].astype(str).values
+    df_metadata['media'] = "movie"
+    df_metadata['tmdb_id'] = df_found['id'].values
+    df_metadata['keywords'] = df_found['keywords'].values
+    return df_metadata
+
+# Function to get film metadata of films not in the catalog from TMDb concurrently as df indexed by IMDb ID
+def getTMDbMetadataDF(imdb_ids, progress_callback):
+    film_metadata = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as executor:
+        futures = {executor.submit(getFilmMetadata, imdbID): imdbID for imdbID in imdb_ids}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            film_metadata[futures[future]] = future.result()
+            progress_callback(done, len(futures))
+
+    df_metadata = pd.DataFrame.from_dict(film_metadata, orient='index', columns=METADATA_COLUMNS + ['genre_ids'])
+    df_metadata['genres'] = getGenresFromIDs(df_metadata['genre_ids'], df_metadata['media'])
+    return df_metadata[METADATA_COLUMNS]
 
 # Function to Create DF with Film Metadata
-def getFilmMetadataDF(film_df):
-    adult = []
-    original_language = []
-    overview = []
-    vote_average = []
-    vote_count = []
-    popularity = []
-    release_date = [] # For TV (First Release Date)
-    poster_path = []
-    genres = []
-    media = []
-    tmdb_id = []
-    # Get Genre List
-    tVGenreList = getTVGenreList()
-    movieGenreList = getMovieGenreList()
-
-    progress = 0
-    bar = st.progress(progress)
-    for index, row in film_df.iterrows():
-        progress = progress+1
-        with st.spinner('Getting movie details: '+row['title']):
-            # Get IMDb ID for film
-            imdbID = row['IMDb_ID']
-            print("Getting details for: "+row['title'] + " (" + imdbID + ")" )
-        
-            # Call function to get Film Details
-            tmdbResponse = getFilmDetailsTMDb(imdbID)
-            filmDetail = json.loads(tmdbResponse)
-            # For Movies
-            if(len(filmDetail['movie_results'])!=0):
-                adult.append(str(filmDetail['movie_results'][0]['adult']))
-                original_language.append(str(filmDetail['movie_results'][0]['original_language']))
-                overview.append(str(filmDetail['movie_results'][0]['overview'].replace('\n', ' ')))
-                vote_average.append(str(filmDetail['movie_results'][0]['vote_average']))
-                vote_count.append(str(filmDetail['movie_results'][0]['vote_count']))
-                popularity.append(filmDetail['movie_results'][0]['popularity'])
-                release_date.append(filmDetail['movie_results'][0]['release_date'])
-                
-                movieGenreIDs = filmDetail['movie_results'][0]['genre_ids']
-                movieGenres = getGenresFromID(movieGenreList, movieGenreIDs)
-                genres.append(movieGenres)
-                poster_path.append(str(filmDetail['movie_results'][0]['poster_path']))
-                media.append("movie")
-                tmdb_id.append(filmDetail['movie_results'][0]['id'])
-            
-            # For TV
-            elif(len(filmDetail['tv_results'])!=0):
-                adult.append(str(filmDetail['tv_results'][0]['adult']))
-                original_language.append(str(filmDetail['tv_results'][0]['original_language']))
-                overview.append(str(filmDetail['tv_results'][0]['overview'].replace('\n', ' ')))
-                vote_average.append(str(filmDetail['tv_results'][0]['vote_average']))
-                vote_count.append(str(filmDetail['tv_results'][0]['vote_count']))
-                popularity.append(filmDetail['tv_results'][0]['popularity'])
-                release_date.append(filmDetail['tv_results'][0]['first_air_date'])
-                
-                tvGenreIDs = filmDetail['tv_results'][0]['genre_ids']
-                tvGenres = getGenresFromID(tVGenreList, tvGenreIDs)
-                genres.append(tvGenres)
-                poster_path.append(str(filmDetail['tv_results'][0]['poster_path']))
-                media.append("TV")
-                tmdb_id.append(filmDetail['tv_results'][0]['id'])
-
-            else:
-                errorString = ""
-                adult.append(errorString)
-                original_language.append(errorString)
-                overview.append(errorString)
-                vote_average.append(errorString)
-                vote_count.append(errorString)
-                popularity.append(errorString)
-                release_date.append(errorString)
-                genres.append(errorString)
-                poster_path.append(errorString)
-                media.append(errorString)
-                tmdb_id.append(errorString)
-        bar.progress(progress/len(film_df))
-    bar.empty()
-    # Add the new_ratings list as a new column to the dataframe
-    film_df['adult'] = adult
-    film_df['original_language'] = original_language
-    film_df['overview'] = overview
-    film_df['vote_average'] = vote_average
-    film_df['vote_count'] = vote_count
-    film_df['popularity'] = popularity
-    film_df['release_date'] = release_date
-    film_df['genres'] = genres
-    film_df["poster_path"] = poster_path
-    film_df["media"] = media
-    film_df["tmdb_id"] = tmdb_id
+# Films found in df_catalog (by IMDb ID) are filled from the catalog, only the others are sent to TMDb.
+# progress_callback(done, total) is called from the calling thread as films are completed,
+# a progress bar is shown when no callback is given
+def getFilmMetadataDF(film_df, progress_callback=None, df_catalog=None):
+    imdb_ids = film_df['IMDb_ID'].unique()
+    if df_catalog is not None:
+        df_catalog_metadata = getCatalogMetadataDF(imdb_ids, df_catalog)
+    else:
+        df_catalog_metadata = pd.DataFrame(columns=METADATA_COLUMNS)
+    missing_ids = [imdbID for imdbID in imdb_ids if imdbID not in df_catalog_metadata.index]
+    print("Films found in catalog: {0}, fetching from TMDb: {1}".format(len(df_catalog_metadata), len(missing_ids)))
+
+    bar = None
+    if progress_callback is None and len(missing_ids) != 0:
+        bar = st.progress(0)
+        progress_callback = lambda done, total: bar.progress(done/total)
+
+    # Get film details of films not in catalog concurrently
+    df_tmdb_metadata = getTMDbMetadataDF(missing_ids, progress_callback)
+    if bar is not None:
+        bar.empty()
+
+    # Join film details back to film df by IMDb ID
+    df_metadata = pd.concat([df_catalog_metadata, df_tmdb_metadata])
+    for column in METADATA_COLUMNS:
+        film_df[column] = film_df['IMDb_ID'].map(df_metadata[column])
     # drop rows with no tmdb_id
     film_df = film_df[film_df['tmdb_id']!=""].reset_index(drop=True)
     return film_df
@@ -313,11 +371,11 @@ def getFilmMetadataDF(film_df):
 # Function to get poster path of movie with imdb_id
 def get_poster_path(imdb_id):
     # Get URL Prompt to access TMDb API
-    film_details_TMDb_url = "https://api.themoviedb.org/3/find/" + imdb_id + "?external_source=imdb_id"
+    film_details_TMDb_url = TMDB_API_URL + "/find/" + imdb_id + "?external_source=imdb_id"
     
     # Get response from TMDb API
-    response = requests.get(film_details_TMDb_url, headers=headers)
-    filmDetail = json.loads(response.text)
+    response = tmdb_get(film_details_TMDb_url, headers=headers)
+    filmDetail = json.loads(response)
     if(len(filmDetail['movie_results'])!=0):
         return filmDetail['movie_results'][0]['poster_path']
     elif(len(filmDetail['tv_results'])!=0):
@@ -0,0 +1,162 @@
+import functools
+import threading
+import pandas as pd
+
+from netflix_processing import process_netflixhistory, getNetflixMetadata, check_netflixhistory
+from letterboxd_processing import scrape_all_films, scrape_films_one_page, getFilmMetadataDF, getGenreLookup
+
+
+# Function to get result of member ingestion as dict with 'profile', 'full_profile', 'profile_metadata', 'netflixhistory'
+# (processed Netflix Viewing History, only used between scraping and metadata) and 'error' (error message or None)
+def member_result(df_user_profile=None, df_full_user_profile=None, df_user_profile_metadata=None, df_netflixhistory=None, error=None):
+    return {
+        'profile': df_user_profile,
+        'full_profile': df_full_user_profile,
+        'profile_metadata': df_user_profile_metadata,
+        'netflixhistory': df_netflixhistory,
+        'error': error
+    }
+
+# Function to get number of (scraping, metadata) progress stages of member
+def get_member_stage_counts(input_type, full_profile=True):
+    use_netflix = input_type == "netflix" or input_type == "both"
+    use_letterboxd = input_type == "username" or input_type == "both"
+    # first page and full profile are scraped from Letterboxd, then Netflix and Letterboxd titles get metadata
+    scrape_stages = (2 if full_profile else 1) if use_letterboxd else 0
+    metadata_stages = (1 if use_netflix else 0) + (1 if use_letterboxd else 0)
+    return scrape_stages, metadata_stages
+
+# Function to scrape member's profile from Letterboxd and process Netflix Viewing History (no catalog needed)
+# Runs on a worker thread, so it makes no streamlit calls: errors are returned in the result and
+# progress_callback(fraction, status) reports progress. The full profile is only scraped when full_profile is True
+def scrape_member(username, netflixhistory, input_type, progress_callback, full_profile=True):
+    n_stages = max(get_member_stage_counts(input_type, full_profile)[0], 1)
+    df_netflixhistory = None
+    df_user_profile = None
+    df_full_user_profile = None
+
+    # Process netflix input
+    if input_type == "netflix" or input_type == "both":
+        # convert netflixhistory to dataframe
+        netflixhistory = pd.read_csv(netflixhistory)
+        # check validity of netflixhistory
+        validity = check_netflixhistory(netflixhistory)
+        if validity == "invalid":
+            return member_result(error="Error. Netflix Viewing History is invalid. Please try again.")
+        elif validity == "insufficient":
+            return member_result(error="Error. Netflix Viewing History is insufficient. Please make sure you have viewed at least 5 titles using your Netflix account.")
+        # process netflixhistory
+        df_netflixhistory = process_netflixhistory(netflixhistory)
+
+    # Process Letterboxd input
+    if input_type == "username" or input_type == "both":
+        progress_callback(0.0, "Scraping movies on Letterboxd")
+        df_user_profile = scrape_films_one_page(username, progress_callback=lambda done, total: progress_callback(done / total / n_stages, "Scraping movies on Letterboxd"))
+        # check if df_user_profile is empty
+        if df_user_profile.empty:
+            return member_result(error="Error. Username or profile ratings not found. Please try again.")
+
+        if full_profile:
+            # get full profile
+            progress_callback(1 / n_stages, "Scraping full profile on Letterboxd")
+            df_full_user_profile = scrape_all_films(username)
+
+    progress_callback(1.0, "Scraped")
+    return member_result(df_user_profile, df_full_user_profile, df_netflixhistory=df_netflixhistory)
+
+# Function to get metadata of member's titles from catalog and TMDb and combine Netflix and Letterboxd profiles
+# (scraped is the result of scrape_member). Runs on a worker thread like scrape_member
+def get_member_metadata(scraped, input_type, df_catalog, title_index, progress_callback):
+    if scraped['error'] is not None:
+        return scraped
+    n_stages = max(get_member_stage_counts(input_type)[1], 1)
+    stage = 0
+    df_user_profile = scraped['profile']
+    df_full_user_profile = scraped['full_profile']
+
+    # Function to get callback(done, total) reporting progress within the current stage
+    def stage_progress(status):
+        progress_callback(stage / n_stages, status)
+        return lambda done, total: progress_callback((stage + done / total) / n_stages, status)
+
+    if input_type == "netflix" or input_type == "both":
+        # get netflix metadata
+        df_netflixhistory_metadata = getNetflixMetadata(scraped['netflixhistory'], df_catalog=df_catalog, title_index=title_index,
+                                                        progress_callback=stage_progress("Getting Netflix Data"))
+        stage += 1
+
+    if input_type == "username" or input_type == "both":
+        # Get film metadata from catalog and TMDB API
+        df_user_profile_metadata = getFilmMetadataDF(df_user_profile, progress_callback=stage_progress("Getting movie details"), df_catalog=df_catalog)
+        stage += 1
+
+    # Check if input_type is both
+    if input_type == "both":
+        # drop rows in df_netflixhistory_metadata that exists in df_user_profile_metadata
+        df_netflixhistory_metadata = df_netflixhistory_metadata[~df_netflixhistory_metadata['IMDb_ID'].isin(df_user_profile_metadata['IMDb_ID'])]
+        # Combine netflix metadata with letterboxd metadata
+        df_user_profile_metadata = pd.concat([df_user_profile_metadata, df_netflixhistory_metadata], ignore_index=True)
+
+        if df_full_user_profile is not None:
+            # drop rows in df_netflixhistory_metadata that exists in df_full_user_profile
+            df_netflix_full = df_netflixhistory_metadata[~df_netflixhistory_metadata['title'].isin(df_full_user_profile['title'])]
+            df_full_user_profile = pd.concat([df_full_user_profile, df_netflix_full], ignore_index=True)
+            # reset index
+            df_full_user_profile = df_full_user_profile.reset_index(drop=True)
+
+    if input_type == "netflix":
+        df_user_profile_metadata = df_netflixhistory_metadata
+        df_user_profile = df_netflixhistory_metadata
+        df_full_user_profile = df_netflixhistory_metadata
+
+    progress_callback(1.0, "Done")
+    return member_result(df_user_profile, df_full_user_profile, df_user_profile_metadata)
+
+# Function to run step of member ingestion, unexpected failures are returned as the member's error instead of failing the group
+def run_member_step_safely(step, *args, **kwargs):
+    try:
+        return step(*args, **kwargs)
+    except Exception as e:
+        print("Error in {0}: {1!r}".format(step.__name__, e))
+        return member_result(error="Error. Profile could not be processed. Please try again.")
+
+# Function to get progress tracker of members (progress of each member as (fraction, status))
+def get_progress_tracker(n_members):
+    return {'members': [(0.0, "Waiting")] * n_members, 'lock': threading.Lock()}
+
+# Function to get callback(fraction, status) setting member's progress in tracker (can be called from any thread),
+# the fraction is mapped to [start, end] of the member's progress
+def get_member_progress_callback(tracker, member, start=0.0, end=1.0):
+    def update(fraction, status):
+        with tracker['lock']:
+            tracker['members'][member] = (start + fraction * (end - start), status)
+    return update
+
+# Function to get copy of progress of each member in tracker
+def get_member_progress(tracker):
+    with tracker['lock']:
+        return list(tracker['members'])
+
+# Function to load genre lookups used for members' metadata (cached resources, loaded once before members need them)
+def load_genre_lookups():
+    return getGenreLookup("movie"), getGenreLookup("tv")
+
+# Function to get metadata of member as pipeline stage (genre_lookups are only needed to be loaded)
+def get_member_metadata_stage(input_type, progress_callback, scraped, df_catalog, title_index, genre_lookups):
+    return run_member_step_safely(get_member_metadata, scraped, input_type, df_catalog, title_index, progress_callback)
+
+# Function to get pipeline stages (see pipeline.run_pipeline) ingesting members concurrently.
+# "scrape_<k>" stages need no other stage, "member_<k>" stages also need the "catalog" and "title_index" stages
+# and give the member's result (see member_result). Progress of each member is set in tracker
+def get_member_pipeline_stages(usernames, netflixhistories, input_types, tracker, full_profile=True):
+    stages = [("genre_lookups", load_genre_lookups, [])]
+    for member, (username, netflixhistory, input_type) in enumerate(zip(usernames, netflixhistories, input_types)):
+        # share of member's progress taken by scraping
+        scrape_stages, metadata_stages = get_member_stage_counts(input_type, full_profile)
+        scrape_share = scrape_stages / max(scrape_stages + metadata_stages, 1)
+        scrape = functools.partial(run_member_step_safely, scrape_member, username, netflixhistory, input_type,
+                                   get_member_progress_callback(tracker, member, 0.0, scrape_share), full_profile)
+        metadata = functools.partial(get_member_metadata_stage, input_type, get_member_progress_callback(tracker, member, scrape_share, 1.0))
+        stages.append(("scrape_" + str(member + 1), scrape, []))
+        stages.append(("member_" + str(member + 1), metadata, ["scrape_" + str(member + 1), "catalog", "title_index", "genre_lookups"]))
+    return stages
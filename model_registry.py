@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from individual_reco import getPyMongoDBFiltered, trainSVDModel, getModelFromSVD
+
+# Directory holding one sub-directory per model version and the CURRENT pointer
+MODEL_REGISTRY_DIR = "models"
+# File holding the name of the version served by the app
+CURRENT_FILE = os.path.join(MODEL_REGISTRY_DIR, "CURRENT")
+FACTORS_FILE = "factors.npz"
+METADATA_FILE = "metadata.json"
+
+model_lock = threading.Lock()
+loaded_model = None
+
+
+# Function to get directory of model version
+def get_version_dir(version):
+    return os.path.join(MODEL_REGISTRY_DIR, version)
+
+# Function to get version currently pointed to by CURRENT (None if no model has been published)
+def get_current_version():
+    try:
+        with open(CURRENT_FILE) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# Function to point CURRENT to model version (readers never see a partly written pointer)
+def set_current_version(version):
+    tmp_file = CURRENT_FILE + ".tmp"
+    with open(tmp_file, 'w') as file:
+        file.write(version)
+    os.replace(tmp_file, CURRENT_FILE)
+
+# Function to write model (see individual_reco.getModelFromSVD) as new version and make it current
+def publish_model(model, metadata=None):
+    version = "v" + time.strftime("%Y%m%d%H%M%S")
+    # versions published within the same second get a suffix
+    suffix = 1
+    while os.path.exists(get_version_dir(version)):
+        version = "v" + time.strftime("%Y%m%d%H%M%S") + "_" + str(suffix)
+        suffix += 1
+    os.makedirs(MODEL_REGISTRY_DIR, exist_ok=True)
+    # write to temporary directory first so a version directory is always complete
+    tmp_dir = get_version_dir(version + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.savez(os.path.join(tmp_dir, FACTORS_FILE), bi=model['bi'], qi=model['qi'], item_ids=model['item_ids'])
+    metadata = dict(metadata or {})
+    metadata.update({
+        'version': version,
+        'trained_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'global_mean': float(model['global_mean']),
+        'reg_bu': float(model['reg_bu']),
+        'reg_pu': float(model['reg_pu']),
+        'rating_scale': list(model['rating_scale']),
+        'n_items': int(len(model['item_ids'])),
+        'n_factors': int(model['qi'].shape[1]),
+    })
+    with open(os.path.join(tmp_dir, METADATA_FILE), 'w') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(tmp_dir, get_version_dir(version))
+    set_current_version(version)
+    print("Published model version: " + version)
+    return version
+
+# Function to load model version from registry
+def load_model(version):
+    version_dir = get_version_dir(version)
+    with open(os.path.join(version_dir, METADATA_FILE)) as file:
+        metadata = json.load(file)
+    with np.load(os.path.join(version_dir, FACTORS_FILE)) as factors:
+        bi = factors['bi']
+        qi = factors['qi']
+        item_ids = factors['item_ids']
+    return {
+        'version': version,
+        'global_mean': metadata['global_mean'],
+        'bi': bi,
+        'qi': qi,
+        'item_ids': item_ids,
+        'item_index': pd.Index(item_ids),
+        'reg_bu': metadata['reg_bu'],
+        'reg_pu': metadata['reg_pu'],
+        'rating_scale': tuple(metadata['rating_scale']),
+        'metadata': metadata,
+    }
+
+# Function to train SVD model on ratings dataset and publish it as new version
+def train_and_publish_model():
+    df_small_ratingsDB = getPyMongoDBFiltered("ratings_small", columns=['userId', 'movieId', 'rating'])
+    svd = trainSVDModel(df_small_ratingsDB)
+    metadata = {'dataset': 'ratings_small', 'n_ratings': int(len(df_small_ratingsDB)), 'n_epochs': svd.n_epochs,
+                'lr_all': svd.lr_bu}
+    return publish_model(getModelFromSVD(svd), metadata)
+
+# Function to get current model (loaded once per process and shared by all sessions)
+# A new version published to CURRENT is loaded in full before it replaces the model in use.
+# Models are never trained while serving a request, one must be published at deploy time
+def get_model():
+    global loaded_model
+    version = get_current_version()
+    if loaded_model is not None and loaded_model['version'] == version:
+        return loaded_model
+    with model_lock:
+        version = get_current_version()
+        if version is None:
+            raise RuntimeError("No SVD model has been published to " + MODEL_REGISTRY_DIR + ". "
+                               "Run `python model_registry.py` when deploying, before starting the app.")
+        if loaded_model is None or loaded_model['version'] != version:
+            print("Loading model version: " + version)
+            loaded_model = load_model(version)
+        return loaded_model
+
+
+if __name__ == "__main__":
+    # Train and publish new model version offline with: python model_registry.py
+    # Running app servers pick up the new version on their next request
+    train_and_publish_model()
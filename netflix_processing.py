@@ -1,12 +1,24 @@
 import pandas as pd
+import json
+import re
 import nltk
-import requests
-from letterboxd_processing import getGenresFromID, getTVGenreList, getMovieGenreList
+import concurrent.futures
+from http_client import HTTP_POOL_SIZE
+from tmdb_cache import tmdb_get, TMDB_API_URL
+from letterboxd_processing import getGenresFromIDs, getTitleDetailsTMDb
+from individual_reco import get_details_keyword_string
+from genres import get_genre_masks, get_genre_pattern_mask
+from title_matcher import match_titles
 import warnings
 import streamlit as st
 
 warnings.filterwarnings("ignore")
 
+# Netflix lists episodes as "Show: Season 1: Episode" (or "Show: Limited Series: Episode"), so titles with two colons
+# or a season-like part after the first colon are series. Movies with one colon (e.g. "Mission: Impossible") keep
+# their full title. A movie whose title has two colons is taken as a series and searched on TMDb under its first part
+NETFLIX_SERIES_PATTERN = re.compile(r':.*:|:\s*(?:season|series|limited series|volume|vol\.|chapter|episode|book)\b', re.IGNORECASE)
+
 headers = {
     "accept": "application/json",
     "Authorization": "Bearer "+ st.secrets['tmdb_key']
@@ -28,8 +40,11 @@ def check_netflixhistory(netflixhistory):
 
 # Function to process netflixhistory df
 def process_netflixhistory(netflixhistory):
-    # Remove values after : in Title column
-    netflixhistory['Title'] = netflixhistory['Title'].str.split(':', expand=True)[0]
+    # Series are listed as "Show: Season: Episode" (see NETFLIX_SERIES_PATTERN)
+    netflixhistory['is_series'] = netflixhistory['Title'].str.contains(NETFLIX_SERIES_PATTERN, na=False)
+    # Remove values after : in Title column of series
+    series_titles = netflixhistory['Title'].str.split(':').str[0]
+    netflixhistory['Title'] = netflixhistory['Title'].where(~netflixhistory['is_series'], series_titles)
 
     # Remove duplicate rows
     netflixhistory = netflixhistory.drop_duplicates()
@@ -55,11 +70,11 @@ def process_netflixhistory(netflixhistory):
 
 def getTVDetailsNetflix(searchString):
     # Create URL
-    tv_url = "https://api.themoviedb.org/3/search/tv?query=" + searchString + "&include_adult=false&page=1"
+    tv_url = TMDB_API_URL + "/search/tv?query=" + searchString + "&include_adult=false&page=1"
     # Get Response
-    tv_response = requests.get(tv_url, headers=headers)
+    tv_response = tmdb_get(tv_url, headers=headers)
     # Convert Response to JSON
-    tv_response_json = tv_response.json()
+    tv_response_json = json.loads(tv_response)
 
     # check if response_json is not empty
     if len(tv_response_json['results']) != 0:
@@ -71,11 +86,11 @@ def getTVDetailsNetflix(searchString):
     
 def getFilmDetailsNetflix(searchString):
     # Create URL
-    movie_url = "https://api.themoviedb.org/3/search/movie?query=" + searchString + "&include_adult=false&page=1"
+    movie_url = TMDB_API_URL + "/search/movie?query=" + searchString + "&include_adult=false&page=1"
     # Get Response
-    movie_response = requests.get(movie_url, headers=headers)
+    movie_response = tmdb_get(movie_url, headers=headers)
     # Convert Response to JSON
-    movie_response_json = movie_response.json()
+    movie_response_json = json.loads(movie_response)
 
     # check if response_json is not empty
     if len(movie_response_json['results']) != 0:
@@ -84,63 +99,55 @@ def getFilmDetailsNetflix(searchString):
     else:
         return "Not Movie"
     
-# Function to get IMDb ID from TMDB API
-def getTVIMDbID(id):
-    url = "https://api.themoviedb.org/3/tv/"+id+"/external_ids"
-    response = requests.get(url, headers=headers)
-    response_json = response.json()
-    # check if response_json imdb_id is not empty
-    if response_json['imdb_id'] != "":
-        return response_json['imdb_id']
-    else:
-        return "None"
-    
-def getFilmIMDbID(id):
-    url = "https://api.themoviedb.org/3/movie/"+id+"/external_ids"
-    response = requests.get(url, headers=headers)
-    response_json = response.json()
-    # check if response_json imdb_id is not empty
-    if response_json['imdb_id'] != "":
-        return response_json['imdb_id']
-    else:
-        return "None"
+# Function to get IMDb ID and keywords of movie or TV title ("movie" or "tv") from one TMDB API request
+def getTitleIMDbIDAndKeywords(media, id):
+    response_json = json.loads(getTitleDetailsTMDb(media, id))
+    # check if imdb_id is not empty
+    imdb_id = response_json.get('external_ids', {}).get('imdb_id')
+    if not imdb_id:
+        imdb_id = "None"
+    return imdb_id, get_details_keyword_string(response_json)
 
 # Function to apply rating rules for movies
 def applyMovieRating(df_movie, top3_genre, least_genre):
+    top3_mask = get_genre_pattern_mask(top3_genre)
+    least_mask = get_genre_pattern_mask([least_genre])
     # Frequency > 5, vote_average > 7, rating 5
     df_movie.loc[(df_movie['frequency'] > 5) & (df_movie['vote_average'] >= 7), 'rating'] = 5
     # Frequency >2 in top 3 genre, vote_average > 6.5, rating 4.5
-    df_movie.loc[(df_movie['frequency'] > 2) & (df_movie['genres'].str.contains('|'.join(top3_genre))) & (df_movie['vote_average'] >= 6.5), 'rating'] = 4.5
+    df_movie.loc[(df_movie['frequency'] > 2) & ((df_movie['genre_mask'] & top3_mask) != 0) & (df_movie['vote_average'] >= 6.5), 'rating'] = 4.5
     # In top 3 genre, vote_average > 7, rating 4
-    df_movie.loc[(df_movie['genres'].str.contains('|'.join(top3_genre))) & (df_movie['vote_average'] >= 7), 'rating'] = 4
+    df_movie.loc[((df_movie['genre_mask'] & top3_mask) != 0) & (df_movie['vote_average'] >= 7), 'rating'] = 4
     # Frequency >3, rating 4
     df_movie.loc[(df_movie['frequency'] >3), 'rating'] = 4
     # Frequency >1 in top 3 genre, vote_average > 6.5, rating 3.5
-    df_movie.loc[(df_movie['frequency'] > 1) & (df_movie['genres'].str.contains('|'.join(top3_genre))) & (df_movie['vote_average'] >= 6.5), 'rating'] = 3.5
+    df_movie.loc[(df_movie['frequency'] > 1) & ((df_movie['genre_mask'] & top3_mask) != 0) & (df_movie['vote_average'] >= 6.5), 'rating'] = 3.5
     # Vote_average > 8, rating 3.5
     df_movie.loc[(df_movie['vote_average'] >= 8), 'rating'] = 3.5
     # Frequency 1, in least fav genre, rating 2
-    df_movie.loc[(df_movie['frequency'] == 1) & (df_movie['genres'].str.contains(least_genre)) & (df_movie['vote_average'] <= 5), 'rating'] = 2
+    df_movie.loc[(df_movie['frequency'] == 1) & ((df_movie['genre_mask'] & least_mask) != 0) & (df_movie['vote_average'] <= 5), 'rating'] = 2
     # Others rating 3
     df_movie.loc[(df_movie['rating'].isnull()), 'rating'] = 3
     return df_movie
 
 # Function to apply rating rules for tv
 def applyTVRating(df_tv, top3_genre, least_genre):
+    top3_mask = get_genre_pattern_mask(top3_genre)
+    least_mask = get_genre_pattern_mask([least_genre])
     # Frequency > 40, rating 5
     df_tv.loc[(df_tv['frequency'] > 40), 'rating'] = 5
     # Frequency > 14 in top 3 genre, rating 5
-    df_tv.loc[(df_tv['frequency'] > 14) & (df_tv['genres'].str.contains('|'.join(top3_genre))) & (df_tv['vote_average'] >= 7.5), 'rating'] = 5
+    df_tv.loc[(df_tv['frequency'] > 14) & ((df_tv['genre_mask'] & top3_mask) != 0) & (df_tv['vote_average'] >= 7.5), 'rating'] = 5
     # In top 3 genre, vote_average>7, rating 4
-    df_tv.loc[(df_tv['genres'].str.contains('|'.join(top3_genre))) & (df_tv['vote_average'] >= 7), 'rating'] = 4
+    df_tv.loc[((df_tv['genre_mask'] & top3_mask) != 0) & (df_tv['vote_average'] >= 7), 'rating'] = 4
     # Frequency > 20, rating 4
     df_tv.loc[(df_tv['frequency'] > 20), 'rating'] = 4
     # Frequency > 10 in top 3 genre, rating 3.5
-    df_tv.loc[(df_tv['frequency'] > 10) & (df_tv['genres'].str.contains('|'.join(top3_genre))), 'rating'] = 3.5
+    df_tv.loc[(df_tv['frequency'] > 10) & ((df_tv['genre_mask'] & top3_mask) != 0), 'rating'] = 3.5
     # Frequency <5, vote_average < 5, rating 2.5
     df_tv.loc[(df_tv['frequency'] < 5) & (df_tv['vote_average'] <= 5), 'rating'] = 2.5
     # Frequency 1, in least fav genre, rating 2
-    df_tv.loc[(df_tv['frequency'] == 1) & (df_tv['genres'].str.contains(least_genre)) & (df_tv['vote_average'] <= 5), 'rating'] = 2
+    df_tv.loc[(df_tv['frequency'] == 1) & ((df_tv['genre_mask'] & least_mask) != 0) & (df_tv['vote_average'] <= 5), 'rating'] = 2
     # Others rating 3
     df_tv.loc[(df_tv['rating'].isnull()), 'rating'] = 3
     return df_tv
@@ -161,74 +168,122 @@ def get_genres(df):
     least_genre = genres.most_common()[-1][0]
     return top_genres, least_genre
 
-# Function to get top 70 netflix movies
-def getNetflixMetadata(df_netflixhistory):
-    # get top 70
-    df_netflixhistory_top = df_netflixhistory.head(70)
-    df_netflixhistory_top = df_netflixhistory_top.reset_index(drop=True)
-
-    with st.spinner('Getting Netflix TV Data'):
-        # add column for tv details in netflixhistory_analysis
-        df_netflixhistory_top['tv_details'] = df_netflixhistory_top['title_api'].apply(getTVDetailsNetflix)
-
-        # get rows with tv_details = Not TV as a new dataframe netflixhistory_analysis_movie
-        netflixhistory_analysis_movie = df_netflixhistory_top[df_netflixhistory_top['tv_details'] == 'Not TV']
-
-        # drop rows with tv_details = Not TV from netflixhistory_analysis
-        netflixhistory_analysis_tv = df_netflixhistory_top[df_netflixhistory_top['tv_details'] != 'Not TV']
-
-        # for TV 
-        tVGenreList = getTVGenreList()
-        # add relevant column in netflixhistory_analysis_tv extracted from tv_details dict value column
-        netflixhistory_analysis_tv['id'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['id']) 
-        netflixhistory_analysis_tv['IMDb_ID'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: getTVIMDbID(str(x['id'])))
-        netflixhistory_analysis_tv['adult'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['adult']) 
-        netflixhistory_analysis_tv['title'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['name'])
-        netflixhistory_analysis_tv['original_language'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['original_language'])
-        netflixhistory_analysis_tv['overview'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['overview'].replace('\n', ' '))
-        netflixhistory_analysis_tv['vote_average'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['vote_average'])
-        netflixhistory_analysis_tv['vote_count'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['vote_count'])
-        netflixhistory_analysis_tv['popularity'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['popularity'])
-        netflixhistory_analysis_tv['release_date'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['first_air_date'])
-        netflixhistory_analysis_tv['genres'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: getGenresFromID(tVGenreList, x['genre_ids']))
-        netflixhistory_analysis_tv['poster_path'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['poster_path'])
-        netflixhistory_analysis_tv['media'] = 'TV'
-        netflixhistory_analysis_tv['tmdb_id'] = netflixhistory_analysis_tv['tv_details'].apply(lambda x: x['id'])
-
-        # drop irrelevant columns
-        netflixhistory_analysis_tv = netflixhistory_analysis_tv.drop(columns=['tv_details', 'id','title_api','Title','Date'])
-
+# Columns added to netflix history df by getNetflixMetadata
+NETFLIX_METADATA_COLUMNS = ['IMDb_ID', 'keywords', 'adult', 'title', 'original_language', 'overview', 'vote_average',
+                            'vote_count', 'popularity', 'release_date', 'genres', 'genre_ids', 'poster_path', 'media', 'tmdb_id']
+# Maximum number of titles searched on TMDb (titles matched with the catalog are not counted)
+NETFLIX_TMDB_MAX_TITLES = 70
+
+# Function to get metadata of netflix title from TMDB search result, media is "TV" or "movie"
+def parseNetflixDetails(details, media, imdb_id, keywords):
+    return {
+        'IMDb_ID': imdb_id,
+        'keywords': keywords,
+        'adult': details['adult'],
+        'title': details['name'] if media == "TV" else details['title'],
+        'original_language': details['original_language'],
+        'overview': details['overview'].replace('\n', ' '),
+        'vote_average': details['vote_average'],
+        'vote_count': details['vote_count'],
+        'popularity': details['popularity'],
+        'release_date': details['first_air_date'] if media == "TV" else details['release_date'],
+        'genres': None,
+        'genre_ids': details['genre_ids'],
+        'poster_path': details['poster_path'],
+        'media': media,
+        'tmdb_id': details['id']
+    }
+
+# Function to get metadata of netflix movie from catalog row (same format as parseNetflixDetails)
+def getCatalogNetflixDetails(row):
+    release_date = row['release_date']
+    return {
+        'IMDb_ID': row['imdb_id'],
+        'keywords': row['keywords'],
+        'adult': row['adult'] == 'True',
+        'title': row['title'],
+        'original_language': row['original_language'],
+        'overview': (row['overview'] or '').replace('\n', ' '),
+        'vote_average': row['vote_average'],
+        'vote_count': row['vote_count'],
+        'popularity': row['popularity'],
+        'release_date': release_date.strftime('%Y-%m-%d') if pd.notna(release_date) else '',
+        'genres': ','.join(row['genres_list']),
+        'genre_ids': None,
+        'poster_path': row['poster_path'],
+        'media': "movie",
+        'tmdb_id': row['id']
+    }
+
+# Function to resolve one netflix title, TV and movie searches are sent at the same time on search_executor
+# and TV results are used first, returns None when the title is not found
+def resolveNetflixTitle(title_api, search_executor):
+    tv_future = search_executor.submit(getTVDetailsNetflix, title_api)
+    movie_future = search_executor.submit(getFilmDetailsNetflix, title_api)
+    tv_details = tv_future.result()
+    movie_details = movie_future.result()
+    if tv_details != "Not TV":
+        imdb_id, keywords = getTitleIMDbIDAndKeywords('tv', tv_details['id'])
+        return parseNetflixDetails(tv_details, "TV", imdb_id, keywords)
+    elif movie_details != "Not Movie":
+        imdb_id, keywords = getTitleIMDbIDAndKeywords('movie', movie_details['id'])
+        return parseNetflixDetails(movie_details, "movie", imdb_id, keywords)
+    return None
+
+# Function to resolve netflix titles concurrently as dict of title_api: metadata dict (None when not found)
+# progress_callback(done, total) is called from the calling thread as titles are resolved
+def resolveNetflixTitles(titles_api, progress_callback=None):
+    title_metadata = {}
+    # each title waits on its two searches, so at most HTTP_POOL_SIZE requests are sent at the same time
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE) as search_executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE // 2) as title_executor:
+            futures = {title_executor.submit(resolveNetflixTitle, title_api, search_executor): title_api for title_api in titles_api}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                title_metadata[futures[future]] = future.result()
+                if progress_callback is not None:
+                    progress_callback(done, len(futures))
+    return title_metadata
+
+# Function to get metadata of netflix titles, movies are matched with the catalog first
+# and the remaining titles (up to NETFLIX_TMDB_MAX_TITLES) are searched on TMDb.
+# progress_callback(done, total) is called as titles are searched, a spinner is shown when no callback is given
+def getNetflixMetadata(df_netflixhistory, df_catalog=None, title_index=None, progress_callback=None):
+    df_netflixhistory = df_netflixhistory.reset_index(drop=True)
+    title_metadata = {}
+
+    if df_catalog is not None and title_index is not None:
+        # catalog only has movies, so series are always searched on TMDb
+        df_movies = df_netflixhistory[~df_netflixhistory['is_series']]
+        search_titles = df_movies['title_api'].str.replace('%20', ' ')
+        # titles are unique after process_netflixhistory, Date is when each title was watched
+        matches = match_titles(search_titles.values, title_index, watched_dates=df_movies['Date'].values)
+        for title_api, search_title in zip(df_movies['title_api'], search_titles):
+            if search_title in matches:
+                title_metadata[title_api] = getCatalogNetflixDetails(df_catalog.iloc[matches[search_title]])
+
+    # search remaining titles on TMDb, most watched first
+    unresolved_titles = [title_api for title_api in df_netflixhistory['title_api'].unique() if title_api not in title_metadata]
+    print("Netflix titles found in catalog: {0}, searching on TMDb: {1}".format(len(title_metadata), min(len(unresolved_titles), NETFLIX_TMDB_MAX_TITLES)))
+    if progress_callback is None:
+        with st.spinner('Getting Netflix Data'):
+            title_metadata.update(resolveNetflixTitles(unresolved_titles[:NETFLIX_TMDB_MAX_TITLES]))
+    else:
+        title_metadata.update(resolveNetflixTitles(unresolved_titles[:NETFLIX_TMDB_MAX_TITLES], progress_callback))
+
+    # assemble metadata of found titles once, TV titles first as before
+    found = df_netflixhistory['title_api'].map(lambda x: title_metadata.get(x) is not None)
+    df_found = df_netflixhistory[found]
+    df_metadata = pd.DataFrame([title_metadata[title_api] for title_api in df_found['title_api']],
+                               index=df_found.index, columns=NETFLIX_METADATA_COLUMNS)
+    df_found = pd.concat([df_found[['frequency']], df_metadata], axis=1)
+    df_found['genres'] = df_found['genres'].fillna(getGenresFromIDs(df_found['genre_ids'], df_found['media']))
+    df_found['genre_mask'] = get_genre_masks(df_found['genres'])
+    df_found = df_found.drop(columns=['genre_ids'])
+    netflixhistory_analysis_tv = df_found[df_found['media'] == "TV"].copy()
+    netflixhistory_analysis_movie = df_found[df_found['media'] == "movie"].copy()
 
     # check if netflixhistory_analysis_movie is not empty
     if not netflixhistory_analysis_movie.empty:
-        with st.spinner('Getting Netflix Movie Data'):
-            # add column for movie details in netflixhistory_analysis_movie
-            netflixhistory_analysis_movie['movie_details'] = netflixhistory_analysis_movie['title_api'].apply(getFilmDetailsNetflix)
-            # drop rows with movie_details = Not Movie from netflixhistory_analysis_movie
-            netflixhistory_analysis_movie = netflixhistory_analysis_movie[netflixhistory_analysis_movie['movie_details'] != 'Not Movie']
-             # for Movie
-            movieGenreList = getMovieGenreList()
-
-            # add relevant column in netflixhistory_analysis_movie extracted from movie_details dict value column
-            netflixhistory_analysis_movie['id'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['id'])
-            netflixhistory_analysis_movie['IMDb_ID'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: getFilmIMDbID(str(x['id'])))
-            netflixhistory_analysis_movie['adult'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['adult'])
-            netflixhistory_analysis_movie['title'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['title'])
-            netflixhistory_analysis_movie['original_language'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['original_language'])
-            netflixhistory_analysis_movie['overview'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['overview'].replace('\n', ' '))
-            netflixhistory_analysis_movie['vote_average'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['vote_average'])
-            netflixhistory_analysis_movie['vote_count'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['vote_count'])
-            netflixhistory_analysis_movie['popularity'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['popularity'])
-            netflixhistory_analysis_movie['release_date'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['release_date'])
-            netflixhistory_analysis_movie['genres'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: getGenresFromID(movieGenreList, x['genre_ids']))
-            netflixhistory_analysis_movie['poster_path'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['poster_path'])
-            netflixhistory_analysis_movie['media'] = 'movie'
-            netflixhistory_analysis_movie['tmdb_id'] = netflixhistory_analysis_movie['movie_details'].apply(lambda x: x['id'])
-
-            # drop irrelevant columns
-            netflixhistory_analysis_movie = netflixhistory_analysis_movie.drop(columns=['movie_details','id', 'title_api','Title','Date','tv_details'])
-
-
         # combine netflixhistory_analysis_tv and netflixhistory_analysis_movie to find genre
         df_all = pd.concat([netflixhistory_analysis_tv, netflixhistory_analysis_movie], ignore_index=True)
     else:
@@ -0,0 +1,93 @@
+import concurrent.futures
+import time
+
+# Maximum number of pipeline stages running at the same time
+PIPELINE_MAX_WORKERS = 16
+# Seconds between on_wait calls while stages are running
+PIPELINE_WAIT_INTERVAL = 0.2
+
+
+# Function to run stages of pipeline as dependency graph on a thread pool
+# stages is a list of (name, function, names of dependencies). Each function is called with the results of its
+# dependencies (in order) as soon as they are all finished, so independent stages run at the same time.
+# results and timings of stages finished before (e.g. by a previous run_pipeline call) can be used as dependencies.
+# on_wait() is called from the calling thread while stages are running.
+# Returns dict of stage name: result and dict of stage name: (start, end) in time.perf_counter() seconds.
+# If a stage fails, no further stages are started and its exception is raised once the running stages are finished.
+def run_pipeline(stages, results=None, timings=None, on_wait=None, max_workers=PIPELINE_MAX_WORKERS):
+    results = dict(results or {})
+    timings = dict(timings or {})
+    stage_names = [name for name, function, dependencies in stages]
+    for name, function, dependencies in stages:
+        for dependency in dependencies:
+            if dependency not in stage_names and dependency not in results:
+                raise ValueError("Unknown dependency of pipeline stage {0}: {1}".format(name, dependency))
+
+    # Function to run stage and record its timing (on a worker thread)
+    def run_stage(name, function, args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            timings[name] = (start, time.perf_counter())
+
+    waiting = list(stages)
+    running = {}
+    error = None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            # start stages whose dependencies are all finished
+            if error is None:
+                for stage in list(waiting):
+                    name, function, dependencies = stage
+                    if all([dependency in results for dependency in dependencies]):
+                        waiting.remove(stage)
+                        args = [results[dependency] for dependency in dependencies]
+                        running[executor.submit(run_stage, name, function, args)] = name
+            if len(running) == 0:
+                break
+
+            done, not_done = concurrent.futures.wait(running, timeout=PIPELINE_WAIT_INTERVAL,
+                                                     return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print("Pipeline stage {0} failed: {1!r}".format(name, e))
+                    if error is None:
+                        error = e
+            if on_wait is not None:
+                on_wait()
+
+    if error is not None:
+        raise error
+    if len(waiting) != 0:
+        raise ValueError("Pipeline stages with circular dependencies: " + ", ".join([stage[0] for stage in waiting]))
+    return results, timings
+
+# Function to get critical path of pipeline run as list of stage names
+# (from the last finished stage back through the dependency that finished last)
+def get_critical_path(stages, timings):
+    dependencies = {name: stage_dependencies for name, function, stage_dependencies in stages}
+    name = max(timings, key=lambda stage_name: timings[stage_name][1])
+    path = [name]
+    while True:
+        timed_dependencies = [dependency for dependency in dependencies.get(name, []) if dependency in timings]
+        if len(timed_dependencies) == 0:
+            break
+        name = max(timed_dependencies, key=lambda stage_name: timings[stage_name][1])
+        path.append(name)
+    return path[::-1]
+
+# Function to print timing of each stage and critical path of pipeline run
+def print_pipeline_timings(stages, timings):
+    if len(timings) == 0:
+        return
+    pipeline_start = min([start for start, end in timings.values()])
+    print("Pipeline stage timings:")
+    for name, (start, end) in sorted(timings.items(), key=lambda item: item[1][0]):
+        print("  {0}: started at {1:.2f}s, took {2:.2f}s".format(name, start - pipeline_start, end - start))
+    critical_path = get_critical_path(stages, timings)
+    critical_path_time = timings[critical_path[-1]][1] - pipeline_start
+    print("Critical path ({0:.2f}s): {1}".format(critical_path_time, " -> ".join(critical_path)))
@@ -1,6 +1,8 @@
 import pandas as pd
-import json
-from individual_reco import getPyMongoDB
+import numpy as np
+import ast
+from individual_reco import getPyMongoDBFiltered
+from genres import get_genre_mask
 
 # Check input type
 def check_input_type(username, netflixhistory):
@@ -18,8 +20,8 @@ def check_input_type(username, netflixhistory):
 # Function to clean movie df
 def clean_movie_df(df):
 
-    # drop column _id
-    df = df.drop(['_id'], axis=1)
+    # drop column _id (if not already excluded by projection)
+    df = df.drop(['_id'], axis=1, errors='ignore')
     # remove duplicate rows
     df = df.drop_duplicates().reset_index(drop=True)
     # drop rows with no imdb_id
@@ -28,56 +30,57 @@ def clean_movie_df(df):
     df = df.dropna(subset=['title'])
 
     # combine keywords
-    df_keywords = getPyMongoDB("keywords")
-    df_keywords = df_keywords.drop(['_id'], axis=1)
+    df_keywords = getPyMongoDBFiltered("keywords", columns=['id', 'keywords'])
     df = pd.merge(df, df_keywords, on='id', how = 'left')
     # Filling the numm values as []
     df['keywords'].fillna('[]', inplace=True)
 
-    # Fetching the keyword list from the column     
-    df['keywords'] = df['keywords'].apply(lambda x: [i['name'] for i in eval(x)])
+    # Parse genres, keywords and spoken languages once
+    df = parse_catalog_fields(df)
+    return df
+
+# Function to parse string of python literal list, e.g. "[{'id': 16, 'name': 'Animation'}]"
+def parse_literal_list(value):
+    if not isinstance(value, str) or value == '':
+        return []
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return []
+    if not isinstance(parsed, list):
+        return []
+    return parsed
 
-    # Remove the expty spaces and join all the keyword with spaces
-    df['keywords'] = df['keywords'].apply(lambda x: ' '.join([i.replace(" ",'') for i in x]))
+# Function to parse literal string columns of movie df into lists
+def parse_catalog_fields(df):
+    # genres: names for display and genre bitmask for filtering
+    genres = df['genres'].apply(parse_literal_list)
+    df['genres_list'] = genres.apply(lambda x: [item['name'] for item in x])
+    df['genre_mask'] = df['genres_list'].apply(get_genre_mask).astype(np.uint32)
 
+    # keywords: keyword names without spaces joined with spaces
+    keywords = df['keywords'].apply(parse_literal_list)
+    df['keywords'] = keywords.apply(lambda x: ' '.join([item['name'].replace(" ",'') for item in x]))
+
+    # spoken languages: names for display
+    languages = df['spoken_languages'].apply(parse_literal_list)
+    df['languages_list'] = languages.apply(lambda x: [item['name'] for item in x])
     return df
 
 # Function to filter df by year and rating
 def filter_year_and_rating(df, year_range, rating_range):
-    # convert release date to datetime
-    df['release_date'] = pd.to_datetime(df['release_date'])
+    # get release year without modifying the shared catalog
+    year = pd.to_datetime(df['release_date']).dt.year
 
+    df = df[(year >= year_range[0]) & (year <= year_range[1])]
+    df = df[(df['vote_average'] >= rating_range[0]) & (df['vote_average'] <= rating_range[1])].copy()
     # add year column
-    df['year'] = df['release_date'].dt.year
-    
-    df = df[(df['year'] >= year_range[0]) & (df['year'] <= year_range[1])]
-    df = df[(df['vote_average'] >= rating_range[0]) & (df['vote_average'] <= rating_range[1])]
+    df['year'] = year
     return df
 
-# Function to extract genre keywords only from given row
-def extract_genre(row):
-    return [item['name'] for item in row]
-
-# Function to extract genre keywords only from given row
-def extract_json_to_list(row):
-    # replace single quotes with double quotes
-    row = row.replace("'", '"')
-    json_row = json.loads(row)
-    return [item['name'] for item in json_row]
-
-
-# Function to check genres by row for filtering
-def filter_genres_row(row, genres_to_filter):
-    movie_genres = row['genres_list']
-    for genre in movie_genres:
-        if genre not in genres_to_filter:
-            return False
-    return True
-
 # Function to filter genres
 def filter_genres(df, genres_to_filter):
-    # extract genre keywords only into a list
-    df['genres_list'] = df['genres'].apply(extract_json_to_list)
-    # filter out movies that do not contain any of the genres to filter
-    df = df[df.apply(lambda row: filter_genres_row(row, genres_to_filter), axis=1)]
+    # filter out movies that have any genre not in genres_to_filter
+    allowed_mask = get_genre_mask(genres_to_filter)
+    df = df[(df['genre_mask'] & ~allowed_mask) == 0]
     return df
\ No newline at end of file
@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+from urllib.parse import urlsplit
+
+import pytest
+import streamlit as st
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, ROOT_DIR)
+
+# modules read their secrets when imported, tests never reach TMDb or MongoDB
+st.secrets = {"tmdb_key": "test", "pymongo_user": "mongodb://localhost:27017"}
+
+
+class RecordedResponse:
+    def __init__(self, body):
+        self.status_code = 200 if body is not None else 404
+        self.text = json.dumps(body if body is not None else {"success": False, "status_code": 34})
+
+
+# Fixture serving recorded TMDb responses (tests/fixtures/tmdb_responses.json) through the response cache,
+# gives the list of requested paths
+@pytest.fixture
+def recorded_tmdb(tmp_path, monkeypatch):
+    import tmdb_cache
+    with open(os.path.join(FIXTURES_DIR, "tmdb_responses.json")) as file:
+        responses = json.load(file)
+    requested = []
+
+    def http_get(url, headers=None):
+        parts = urlsplit(url)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        requested.append(path)
+        return RecordedResponse(responses.get(path))
+
+    monkeypatch.setattr(tmdb_cache, "http_get", http_get)
+    monkeypatch.setattr(tmdb_cache, "TMDB_API_URL", "https://api.themoviedb.org/3")
+    monkeypatch.setattr(tmdb_cache, "CACHE_FILE", str(tmp_path / "tmdb_responses.sqlite3"))
+    monkeypatch.setattr(tmdb_cache.thread_data, "conn", None, raising=False)
+    monkeypatch.setitem(tmdb_cache.cache_size, "bytes", None)
+    return requested
+
+
+# Fixture pointing the catalog snapshot and TF-IDF model to a temporary directory
+@pytest.fixture
+def catalog_dir(tmp_path, monkeypatch):
+    import catalog
+    monkeypatch.setattr(catalog, "CATALOG_DIR", str(tmp_path))
+    catalog.load_catalog.clear()
+    catalog.load_catalog_tfidf.clear()
+    yield tmp_path
+    catalog.load_catalog.clear()
+    catalog.load_catalog_tfidf.clear()
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pytest
+
+import catalog
+
+
+def test_shared_catalog_columns_are_read_only(catalog_dir):
+    df_snapshot = pd.DataFrame({
+        'id': np.array([949, 550], dtype=np.int64),
+        'title': ['Heat', None],
+        'vote_average': [7.9, np.nan],
+        'release_date': pd.to_datetime(['1995-12-15', None]),
+        'genre_mask': np.array([384, 0], dtype=np.uint32),
+        'genres_list': [['Action', 'Crime'], []],
+        'languages_list': [['English'], []],
+    })
+    feather.write_feather(df_snapshot, catalog.get_catalog_path(), compression='uncompressed')
+
+    df_catalog = catalog.load_catalog()
+
+    # columns with and without nulls
+    for column in ['id', 'vote_average', 'release_date', 'genre_mask']:
+        with pytest.raises(ValueError):
+            df_catalog.loc[0, column] = df_catalog[column].iloc[1]
+        with pytest.raises(ValueError):
+            df_catalog[column].values[0] = df_catalog[column].iloc[1]
+    assert df_catalog['vote_average'].iloc[0] == 7.9
+    assert df_catalog['genres_list'].iloc[0] == ['Action', 'Crime']
+    # filtering gives a new frame that can be modified
+    df_filtered = df_catalog[df_catalog['vote_average'] > 7].copy()
+    df_filtered['vote_average'] = 0.0
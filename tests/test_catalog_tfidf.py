@@ -0,0 +1,45 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+import catalog
+from individual_reco import fit_CBF_tfidf, get_CBF_scores
+
+
+def get_catalog():
+    df_catalog = pd.DataFrame({
+        'imdb_id': ['tt0000001', 'tt0000002', 'tt0000003', 'tt0000004'],
+        'CBF_description': ['space station alien crew', 'bank heist robbery crew', 'romance paris wedding', 'alien invasion space'],
+        'genres_list': [['Science Fiction'], ['Crime'], ['Romance'], ['Science Fiction']],
+        'languages_list': [['English']] * 4,
+    })
+    df_catalog['catalog_row'] = np.arange(len(df_catalog), dtype=np.int64)
+    return df_catalog
+
+
+def test_CBF_scores_follow_catalog_row_after_filtering():
+    df_catalog = get_catalog()
+    catalog_tfidf = fit_CBF_tfidf(df_catalog['CBF_description'])
+    sorted_df = pd.DataFrame({'CBF_description': ['alien space']})
+
+    # filtering and reordering with a fresh index, as the recommendation steps do
+    df_movies = df_catalog.iloc[[3, 1, 0]].reset_index(drop=True)
+    scores = get_CBF_scores(df_movies, sorted_df, catalog_tfidf)
+
+    expected = get_CBF_scores(df_catalog, sorted_df, catalog_tfidf)[[3, 1, 0]]
+    np.testing.assert_allclose(scores, expected)
+    assert scores[1] == 0 and scores[0] > 0 and scores[2] > 0
+
+def test_stale_tfidf_is_refitted(catalog_dir):
+    df_catalog = get_catalog()
+    feather.write_feather(df_catalog, catalog.get_catalog_path(), compression='uncompressed')
+    # TF-IDF fitted for an older snapshot with fewer rows
+    with open(catalog.get_tfidf_path(), 'wb') as file:
+        pickle.dump(fit_CBF_tfidf(df_catalog['CBF_description'].head(2)), file)
+
+    vectorizer, tfidf_matrix = catalog.load_catalog_tfidf()
+    assert tfidf_matrix.shape[0] == len(df_catalog)
+    with open(catalog.get_tfidf_path(), 'rb') as file:
+        assert pickle.load(file)[1].shape[0] == len(df_catalog)
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from individual_reco import getFoldInRecommendations, getInnerItemIds
+
+
+def get_model():
+    rng = np.random.default_rng(0)
+    item_ids = np.array([862, 8844, 15602, 31357, 11862], dtype=np.int64)
+    return {'global_mean': 3.5, 'bi': rng.normal(0, 0.3, 5), 'qi': rng.normal(0, 0.3, (5, 4)), 'item_ids': item_ids,
+            'item_index': pd.Index(item_ids), 'reg_bu': 0.02, 'reg_pu': 0.02, 'rating_scale': (0.5, 5.0)}
+
+
+def test_inner_item_ids_of_unknown_movies():
+    assert getInnerItemIds(get_model(), pd.Series([15602, 1, 862])).tolist() == [2, -1, 0]
+
+def test_fold_in_recommendations_skip_rated_items():
+    model = get_model()
+    df_user = pd.DataFrame({'movieId': [8844, 11862, 1], 'rating': [4.0, 2.0, 5.0]})
+    user_bias, user_factors = 0.2, np.array([0.5, -0.1, 0.3, 0.0])
+
+    recommendations = getFoldInRecommendations(model, df_user, user_bias, user_factors)
+
+    # unrated items sorted by movie id in descending order, est = mu + b_u + b_i + q_i . p_u
+    expected = [(min(max(3.5 + user_bias + model['bi'][inner] + model['qi'][inner] @ user_factors, 0.5), 5.0), model['item_ids'][inner])
+                for inner in [3, 2, 0]]
+    assert [movie_id for est, movie_id in recommendations] == [31357, 15602, 862]
+    np.testing.assert_allclose([est for est, movie_id in recommendations], [est for est, movie_id in expected])
@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+import pytest
+
+import model_registry
+
+
+@pytest.fixture
+def registry_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "MODEL_REGISTRY_DIR", str(tmp_path))
+    monkeypatch.setattr(model_registry, "CURRENT_FILE", os.path.join(str(tmp_path), "CURRENT"))
+    monkeypatch.setattr(model_registry, "loaded_model", None)
+    return tmp_path
+
+
+def test_get_model_fails_fast_without_published_model(registry_dir, monkeypatch):
+    monkeypatch.setattr(model_registry, "train_and_publish_model", lambda: pytest.fail("model trained in request"))
+    with pytest.raises(RuntimeError, match="python model_registry.py"):
+        model_registry.get_model()
+
+def test_get_model_loads_published_model(registry_dir):
+    model = {'global_mean': 3.5, 'bi': np.zeros(2), 'qi': np.ones((2, 3)), 'item_ids': np.array([10, 20]),
+             'reg_bu': 0.02, 'reg_pu': 0.02, 'rating_scale': (0.5, 5.0)}
+    version = model_registry.publish_model(model)
+
+    loaded_model = model_registry.get_model()
+    assert loaded_model['version'] == version
+    assert loaded_model['item_index'].tolist() == [10, 20]
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from netflix_processing import process_netflixhistory
+
+
+def test_series_and_movie_titles():
+    netflixhistory = pd.DataFrame({
+        'Title': ['Dark: Season 1: Secrets', 'Dark: Season 1: Lies', 'Mission: Impossible - Fallout',
+                  'The Queen\'s Gambit: Limited Series: Openings', 'Heat', 'Black Mirror: Bandersnatch'],
+        'Date': ['10/01/2023', '09/01/2023', '08/01/2023', '07/01/2023', '06/01/2023', '05/01/2023'],
+    })
+    df_history = process_netflixhistory(netflixhistory).set_index('Title')
+
+    assert df_history['is_series'].to_dict() == {
+        'Dark': True,
+        'Mission: Impossible - Fallout': False,
+        'The Queen\'s Gambit': True,
+        'Heat': False,
+        # interactive film with one colon is kept as a movie
+        'Black Mirror: Bandersnatch': False,
+    }
+    assert df_history.loc['Dark', 'frequency'] == 2
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from pipeline import run_pipeline, get_critical_path
+from individual_reco import getUserRatingSVDDF
+
+
+def test_stages_run_after_their_dependencies():
+    order = []
+    lock = threading.Lock()
+
+    def stage(name, value):
+        def run(*args):
+            with lock:
+                order.append(name)
+            return value + sum(args)
+        return run
+
+    stages = [
+        ("total", stage("total", 0), ["a", "b"]),
+        ("a", stage("a", 1), []),
+        ("b", stage("b", 2), ["a"]),
+    ]
+    results, timings = run_pipeline(stages)
+
+    assert results == {"a": 1, "b": 3, "total": 4}
+    assert order == ["a", "b", "total"]
+    assert set(timings) == {"a", "b", "total"}
+
+def test_previous_results_can_be_dependencies():
+    results, timings = run_pipeline([("double", lambda x: 2 * x, ["x"])], results={"x": 21})
+    assert results["double"] == 42
+
+def test_independent_stages_run_at_the_same_time():
+    barrier = threading.Barrier(2, timeout=5)
+    stages = [("a", lambda: barrier.wait() is not None, []), ("b", lambda: barrier.wait() is not None, [])]
+    results, timings = run_pipeline(stages)
+    assert results == {"a": True, "b": True}
+
+def test_failed_stage_is_raised_and_stops_dependents():
+    started = []
+
+    def fail():
+        raise KeyError("missing")
+
+    stages = [
+        ("fail", fail, []),
+        ("dependent", lambda x: started.append("dependent"), ["fail"]),
+    ]
+    with pytest.raises(KeyError, match="missing"):
+        run_pipeline(stages)
+    assert started == []
+
+def test_unknown_and_circular_dependencies():
+    with pytest.raises(ValueError, match="Unknown dependency"):
+        run_pipeline([("a", lambda x: x, ["missing"])])
+    with pytest.raises(ValueError, match="circular"):
+        run_pipeline([("a", lambda b: b, ["b"]), ("b", lambda a: a, ["a"])])
+
+def test_critical_path():
+    stages = [
+        ("catalog", None, []),
+        ("scrape", None, []),
+        ("member", None, ["scrape", "catalog"]),
+        ("svd", None, ["member"]),
+        ("profile", None, ["member"]),
+    ]
+    timings = {
+        "catalog": (0.0, 3.0),
+        "scrape": (0.0, 1.0),
+        "member": (3.0, 4.0),
+        "svd": (4.0, 6.0),
+        "profile": (4.0, 4.5),
+    }
+    assert get_critical_path(stages, timings) == ["catalog", "member", "svd"]
+
+def test_critical_path_of_timed_run():
+    stages = [
+        ("slow", lambda: time.sleep(0.2), []),
+        ("fast", lambda: None, []),
+        ("last", lambda slow, fast: None, ["fast", "slow"]),
+    ]
+    results, timings = run_pipeline(stages)
+    assert get_critical_path(stages, timings) == ["slow", "last"]
+
+
+def test_user_rating_SVD_df_does_not_modify_profile():
+    df_profile = pd.DataFrame({'letterboxd_id': ['1', '2'], 'title': ['Heat', 'Unknown'], 'rating': [4.5, 3.0],
+                               'liked': [True, False], 'letterboxd_link': ['a', 'b'], 'IMDb_ID': ['tt0113277', 'tt9999999']})
+    df_movies = pd.DataFrame({'id': [949], 'imdb_id': ['tt0113277']})
+    columns = list(df_profile.columns)
+
+    df_user_SVD = getUserRatingSVDDF(df_profile, df_movies, username=9999999)
+
+    assert list(df_profile.columns) == columns
+    assert df_user_SVD[['userId', 'movieId', 'rating']].values.tolist() == [[9999999, 949, 4.5]]
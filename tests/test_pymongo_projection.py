@@ -0,0 +1,19 @@
+import pytest
+
+import individual_reco
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def test_filtered_read_only_gets_needed_columns(monkeypatch):
+    db = mongomock.MongoClient().TheMovieDatabase
+    db.keywords.insert_many([
+        {'id': 550, 'keywords': "[{'id': 825, 'name': 'support group'}]", 'unused': 'x'},
+        {'id': 949, 'keywords': "[]"},
+    ])
+    monkeypatch.setattr(individual_reco, "db", db)
+
+    df_keywords = individual_reco.getPyMongoDBFiltered("keywords", columns=['id', 'keywords'])
+
+    assert list(df_keywords.columns) == ['id', 'keywords']
+    assert df_keywords['id'].tolist() == [550, 949]
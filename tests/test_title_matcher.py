@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from title_matcher import normalise_title, build_title_index, match_title, match_titles
+
+
+def get_title_index():
+    df_catalog = pd.DataFrame({
+        'title': ['Amélie', 'The Lion King', 'The Lion King', 'Heat', 'Kung Fu Panda', 'Fast & Furious'],
+        'vote_count': [5000.0, 6000.0, 20.0, 4000.0, 3000.0, 2000.0],
+        'release_date': pd.to_datetime(['2001-04-25', '1994-06-23', '1960-01-01', '1995-12-15', '2008-06-04', '2009-04-02']),
+    })
+    return build_title_index(df_catalog)
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("Amélie", "amelie"),
+    ("  The Lion King!  ", "the lion king"),
+    ("Fast & Furious", "fast and furious"),
+    ("Spider-Man: No Way Home", "spider man no way home"),
+    (None, ""),
+])
+def test_normalise_title(title, expected):
+    assert normalise_title(title) == expected
+
+def test_exact_match_resolves_to_most_voted_movie():
+    position, confidence = match_title("the lion king", get_title_index())
+    assert position == 1
+    assert confidence > 0.99
+
+def test_near_exact_match():
+    position, confidence = match_title("Kung Fu Panda!", get_title_index())
+    assert position == 4
+    assert match_title("Kung Fu Pandas", get_title_index())[0] == 4
+
+def test_match_with_few_votes_is_not_confident():
+    title_index = build_title_index(pd.DataFrame({'title': ['Obscure Film'], 'vote_count': [3.0],
+                                                  'release_date': pd.to_datetime(['1971-01-01'])}))
+    # only movie with this title, but too few votes to trust the title alone
+    assert match_title("Obscure Film", title_index) == (0, 0.0)
+
+def test_match_released_after_watch_date_is_not_confident():
+    assert match_title("Heat", get_title_index(), pd.Timestamp('2020-05-01'))[1] == 1.0
+    assert match_title("Heat", get_title_index(), pd.Timestamp('1990-05-01'))[1] == 0.0
+
+def test_match_titles_keeps_confident_matches():
+    titles = ['Amélie', 'Heat', 'A Title Not In The Catalog', '']
+    watched_dates = pd.to_datetime(['2021-01-01', '1990-01-01', '2021-01-01', '2021-01-01']).values
+    assert match_titles(titles, get_title_index(), watched_dates) == {'Amélie': 0}
@@ -0,0 +1,41 @@
+import json
+import time
+
+import tmdb_cache
+
+
+def get_stored(url):
+    conn = tmdb_cache.get_connection()
+    return conn.execute("SELECT size, last_access FROM responses WHERE url = ?", (tmdb_cache.normalise_url(url),)).fetchone()
+
+
+def test_eviction_keeps_cache_under_max_bytes(recorded_tmdb, monkeypatch):
+    monkeypatch.setattr(tmdb_cache, "CACHE_MAX_BYTES", 600)
+    urls = [tmdb_cache.TMDB_API_URL + "/movie/550?append_to_response=keywords,external_ids",
+            tmdb_cache.TMDB_API_URL + "/tv/70523?append_to_response=keywords,external_ids",
+            tmdb_cache.TMDB_API_URL + "/find/tt0137523?external_source=imdb_id",
+            tmdb_cache.TMDB_API_URL + "/find/tt5753856?external_source=imdb_id"]
+    for url in urls:
+        json.loads(tmdb_cache.tmdb_get(url))
+
+    conn = tmdb_cache.get_connection()
+    total_size = conn.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+    assert total_size <= tmdb_cache.CACHE_MAX_BYTES
+    # running total follows the stored responses
+    assert tmdb_cache.cache_size['bytes'] == total_size
+    # least recently used response is evicted first
+    assert get_stored(urls[0]) is None
+    assert get_stored(urls[-1]) is not None
+
+def test_hit_only_updates_last_access_after_interval(recorded_tmdb, monkeypatch):
+    url = tmdb_cache.TMDB_API_URL + "/movie/550?append_to_response=keywords,external_ids"
+    tmdb_cache.tmdb_get(url)
+    stored_access = get_stored(url)[1]
+
+    tmdb_cache.tmdb_get(url)
+    assert get_stored(url)[1] == stored_access
+
+    monkeypatch.setattr(time, "time", lambda: stored_access + tmdb_cache.LAST_ACCESS_INTERVAL + 1)
+    tmdb_cache.tmdb_get(url)
+    assert get_stored(url)[1] == stored_access + tmdb_cache.LAST_ACCESS_INTERVAL + 1
+    assert recorded_tmdb.count("/3/movie/550?append_to_response=keywords,external_ids") == 1
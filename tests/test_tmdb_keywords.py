@@ -0,0 +1,57 @@
+import pandas as pd
+
+from letterboxd_processing import getFilmMetadataDF
+from individual_reco import sort_rated_df
+
+
+def get_film_df(imdb_ids):
+    return pd.DataFrame({
+        'letterboxd_id': [str(i) for i in range(len(imdb_ids))],
+        'title': ['Film ' + imdb_id for imdb_id in imdb_ids],
+        'rating': [5.0, 4.5, 4.0][:len(imdb_ids)],
+        'liked': [True] * len(imdb_ids),
+        'letterboxd_link': ['https://letterboxd.com/film/' + imdb_id for imdb_id in imdb_ids],
+        'IMDb_ID': imdb_ids,
+    })
+
+def get_catalog():
+    return pd.DataFrame({
+        'id': [949], 'imdb_id': ['tt0113277'], 'title': ['Heat'], 'adult': ['False'], 'original_language': ['en'],
+        'overview': ['Obsessive master thief'], 'vote_average': [7.9], 'vote_count': [6000.0], 'popularity': [40.0],
+        'release_date': pd.to_datetime(['1995-12-15']), 'genres_list': [['Action', 'Crime']],
+        'poster_path': ['/heat.jpg'], 'keywords': ['robbery heist'],
+    })
+
+
+def test_top_films_get_keywords_from_details_request(recorded_tmdb, monkeypatch):
+    # TMDb URLs are built from the base URL imported by letterboxd_processing
+    monkeypatch.setattr("letterboxd_processing.TMDB_API_URL", "https://api.themoviedb.org/3")
+    film_df = get_film_df(['tt0113277', 'tt0137523', 'tt5753856'])
+
+    df_metadata = getFilmMetadataDF(film_df, progress_callback=lambda done, total: None, df_catalog=get_catalog())
+    sorted_df = sort_rated_df(df_metadata).set_index('IMDb_ID')
+
+    # catalog film keeps the catalog keywords, the others come from one details request each
+    assert sorted_df.loc['tt0113277', 'keywords'] == 'robbery heist'
+    assert sorted_df.loc['tt0137523', 'keywords'] == 'support group dual identity nihilism rage and hate self destructiveness '
+    assert sorted_df.loc['tt5753856', 'keywords'] == 'time travel small town missing child '
+    title_requests = [path for path in recorded_tmdb if '/genre/' not in path]
+    assert sorted(title_requests) == sorted([
+        '/3/find/tt0137523?external_source=imdb_id',
+        '/3/find/tt5753856?external_source=imdb_id',
+        '/3/movie/550?append_to_response=keywords,external_ids',
+        '/3/tv/70523?append_to_response=keywords,external_ids',
+    ])
+    assert not any(path.endswith('/keywords') for path in recorded_tmdb)
+
+
+def test_keywords_are_not_requested_again(recorded_tmdb, monkeypatch):
+    monkeypatch.setattr("letterboxd_processing.TMDB_API_URL", "https://api.themoviedb.org/3")
+    film_df = get_film_df(['tt0137523'])
+
+    df_metadata = getFilmMetadataDF(film_df, progress_callback=lambda done, total: None, df_catalog=get_catalog())
+    sort_rated_df(df_metadata)
+    sort_rated_df(df_metadata)
+
+    # second pass is served by the response cache
+    assert recorded_tmdb.count('/3/movie/550?append_to_response=keywords,external_ids') == 1
@@ -0,0 +1,107 @@
+import re
+import unicodedata
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+# Minimum confidence for a title to be matched locally, other titles are searched on TMDb
+TITLE_MATCH_MIN_CONFIDENCE = 0.8
+# Maximum number of similar titles compared for near-exact matches
+TITLE_MATCH_MAX_CANDIDATES = 20
+# Minimum vote count of a catalog movie for a title match to be trusted, a title alone is not enough
+# since a Netflix movie can share its title with a different, little known catalog movie
+TITLE_MATCH_MIN_VOTES = 50
+
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^0-9a-z]+')
+
+
+# Function to normalise title for matching (accents removed, casefolded, punctuation replaced by spaces)
+def normalise_title(title):
+    if not isinstance(title, str):
+        return ""
+    title = title.replace('&', ' and ')
+    title = unicodedata.normalize('NFKD', title)
+    title = ''.join([char for char in title if not unicodedata.combining(char)])
+    title = NON_ALPHANUMERIC_PATTERN.sub(' ', title.casefold())
+    return title.strip()
+
+# Function to get set of trigrams of normalised title
+def get_trigrams(normalised_title):
+    padded = "  " + normalised_title + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Function to build title index over catalog titles as dict with
+# 'titles': normalised title -> (catalog row position, share of votes among catalog rows with that title)
+# 'trigrams': trigram -> list of normalised titles containing it
+# 'vote_counts' and 'release_dates': vote count and release date of each catalog row position
+def build_title_index(df_catalog):
+    normalised_titles = df_catalog['title'].apply(normalise_title)
+    vote_counts = df_catalog['vote_count'].fillna(0).values + 1
+    rows_by_title = {}
+    for position, normalised_title in enumerate(normalised_titles):
+        if normalised_title != "":
+            rows_by_title.setdefault(normalised_title, []).append(position)
+
+    titles = {}
+    trigrams = {}
+    for normalised_title, positions in rows_by_title.items():
+        # titles shared by several movies (e.g. remakes) resolve to the most voted one
+        votes = vote_counts[positions]
+        best = votes.argmax()
+        titles[normalised_title] = (positions[best], votes[best] / votes.sum())
+        for trigram in get_trigrams(normalised_title):
+            trigrams.setdefault(trigram, []).append(normalised_title)
+    return {'titles': titles, 'trigrams': trigrams, 'vote_counts': vote_counts - 1,
+            'release_dates': pd.to_datetime(df_catalog['release_date'], errors='coerce').values}
+
+# Function to check that catalog movie at position can be the watched title (the title match is the first signal):
+# it has at least TITLE_MATCH_MIN_VOTES votes and, if watched_date is given, was released by then
+def is_plausible_match(position, title_index, watched_date=None):
+    if title_index['vote_counts'][position] < TITLE_MATCH_MIN_VOTES:
+        return False
+    release_date = title_index['release_dates'][position]
+    if watched_date is not None and pd.notna(watched_date):
+        return not np.isnat(release_date) and release_date <= np.datetime64(pd.Timestamp(watched_date), 'ns')
+    return True
+
+# Function to match title against title index, returns (catalog row position or None, confidence between 0 and 1)
+# Matches that fail is_plausible_match get confidence 0, so they are searched on TMDb
+def match_title(title, title_index, watched_date=None):
+    normalised_title = normalise_title(title)
+    if normalised_title == "":
+        return None, 0.0
+
+    # exact match of normalised title
+    if normalised_title in title_index['titles']:
+        position, share = title_index['titles'][normalised_title]
+        return position, share if is_plausible_match(position, title_index, watched_date) else 0.0
+
+    # near-exact match: most similar title by trigram Jaccard similarity
+    trigrams = get_trigrams(normalised_title)
+    shared = Counter()
+    for trigram in trigrams:
+        shared.update(title_index['trigrams'].get(trigram, []))
+    best_title, best_similarity = None, 0.0
+    for candidate, shared_count in shared.most_common(TITLE_MATCH_MAX_CANDIDATES):
+        similarity = shared_count / (len(trigrams) + len(get_trigrams(candidate)) - shared_count)
+        if similarity > best_similarity:
+            best_title, best_similarity = candidate, similarity
+    if best_title is None:
+        return None, 0.0
+    position, share = title_index['titles'][best_title]
+    if not is_plausible_match(position, title_index, watched_date):
+        return position, 0.0
+    return position, best_similarity * share
+
+# Function to match titles against title index, returns dict of title: catalog row position
+# for titles matched with at least min_confidence. watched_dates (same order as titles) are the dates
+# the titles were watched, used to reject catalog movies released later
+def match_titles(titles, title_index, watched_dates=None, min_confidence=TITLE_MATCH_MIN_CONFIDENCE):
+    if watched_dates is None:
+        watched_dates = [None] * len(titles)
+    matches = {}
+    for title, watched_date in zip(titles, watched_dates):
+        position, confidence = match_title(title, title_index, watched_date)
+        if position is not None and confidence >= min_confidence:
+            matches[title] = position
+    return matches
@@ -0,0 +1,135 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from http_client import http_get
+
+# Base URL of TMDb API (override with WATCHLIST_TMDB_API_URL, e.g. to use a stand-in server)
+TMDB_API_URL = os.environ.get("WATCHLIST_TMDB_API_URL", "https://api.themoviedb.org/3").rstrip('/')
+# SQLite file storing TMDb responses (shared by all sessions)
+CACHE_FILE = "cache/tmdb_responses.sqlite3"
+# Maximum size of stored (compressed) responses in bytes
+CACHE_MAX_BYTES = int(os.environ.get("WATCHLIST_TMDB_CACHE_BYTES", 256 * 1024 * 1024))
+# Share of CACHE_MAX_BYTES kept after eviction so that eviction does not run on every insert
+CACHE_EVICT_TO = 0.9
+# Seconds before last_access of a cached response is updated again on a hit
+# (least recently used eviction only needs it roughly, so most hits need no write)
+LAST_ACCESS_INTERVAL = 3600
+# Time to live in seconds by TMDb endpoint (first matching path pattern is used)
+ENDPOINT_TTLS = [
+    (re.compile(r'/genre/(movie|tv)/list$'), 30 * 24 * 3600),
+    (re.compile(r'/keywords$'), 30 * 24 * 3600),
+    (re.compile(r'/external_ids$'), 30 * 24 * 3600),
+    (re.compile(r'/(movie|tv)/\d+$'), 7 * 24 * 3600),
+    (re.compile(r'/find/'), 7 * 24 * 3600),
+    (re.compile(r'/search/'), 24 * 3600),
+]
+DEFAULT_TTL = 24 * 3600
+
+thread_data = threading.local()
+stats_lock = threading.Lock()
+cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+# Running total of stored response sizes, read from the cache file on the first insert of the process
+# and updated on each insert, so that inserts do not need to sum the whole table
+size_lock = threading.Lock()
+cache_size = {'bytes': None}
+
+
+# Function to get connection to response cache (one connection per thread)
+def get_connection():
+    conn = getattr(thread_data, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        conn = sqlite3.connect(CACHE_FILE, timeout=30)
+        # WAL lets sessions read while another session is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, body BLOB NOT NULL, "
+                     "size INTEGER NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        thread_data.conn = conn
+    return conn
+
+# Function to normalise URL used as cache key (lowercase host, sorted query parameters)
+def normalise_url(url):
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path.rstrip('/')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+# Function to get time to live of TMDb endpoint
+def get_ttl(url):
+    path = urlsplit(url).path
+    for pattern, ttl in ENDPOINT_TTLS:
+        if pattern.search(path):
+            return ttl
+    return DEFAULT_TTL
+
+# Function to add to hit, miss and eviction counters
+def count(stat, amount=1):
+    with stats_lock:
+        cache_stats[stat] += amount
+
+# Function to get copy of hit, miss and eviction counters
+def get_cache_stats():
+    with stats_lock:
+        return dict(cache_stats)
+
+# Function to add size change of an insert to the running total of stored response sizes, returns the new total
+def add_cache_size(conn, amount):
+    with size_lock:
+        if cache_size['bytes'] is None:
+            cache_size['bytes'] = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        else:
+            cache_size['bytes'] += amount
+        return cache_size['bytes']
+
+# Function to evict least recently used responses down to CACHE_EVICT_TO of CACHE_MAX_BYTES,
+# only called once the running total is over CACHE_MAX_BYTES
+def evict_responses(conn):
+    with size_lock:
+        with conn:
+            # exact total, the running total does not see inserts of other processes
+            total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            to_free = total_size - CACHE_MAX_BYTES * CACHE_EVICT_TO
+            evicted_urls = []
+            if total_size > CACHE_MAX_BYTES:
+                for url, size in conn.execute("SELECT url, size FROM responses ORDER BY last_access"):
+                    evicted_urls.append((url,))
+                    total_size -= size
+                    to_free -= size
+                    if to_free <= 0:
+                        break
+                conn.executemany("DELETE FROM responses WHERE url = ?", evicted_urls)
+        cache_size['bytes'] = total_size
+    count('evictions', len(evicted_urls))
+
+# Function to send GET request to TMDb through the response cache, returns response text
+def tmdb_get(url, headers=None):
+    key = normalise_url(url)
+    now = time.time()
+    conn = get_connection()
+    row = conn.execute("SELECT body, expires_at, last_access, size FROM responses WHERE url = ?", (key,)).fetchone()
+    if row is not None and row[1] > now:
+        if now - row[2] > LAST_ACCESS_INTERVAL:
+            with conn:
+                conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (now, key))
+        count('hits')
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    count('misses')
+    response = http_get(url, headers=headers)
+    # only successful responses are stored
+    if response.status_code == 200:
+        body = zlib.compress(response.text.encode('utf-8'))
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO responses (url, body, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                         (key, body, len(body), now + get_ttl(url), now))
+        # an expired response is replaced, so only the size difference is added
+        replaced_size = row[3] if row is not None else 0
+        if add_cache_size(conn, len(body) - replaced_size) > CACHE_MAX_BYTES:
+            evict_responses(conn)
+    return response.text